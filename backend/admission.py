@@ -0,0 +1,132 @@
+import math
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class AdmissionLimiter:
+    """Admission control for one kind of request.
+
+    At most ``max_active`` requests hold a slot at once and at most
+    ``max_queued`` more wait for one, first come first served, for up to
+    ``queue_timeout`` seconds. One user may hold or wait for at most
+    ``per_user`` slots. Anything beyond that is turned away immediately, so
+    callers can answer 429 instead of letting every request's latency grow.
+    """
+
+    def __init__(self, max_active, max_queued=0, per_user=None, queue_timeout=0.0):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.per_user = per_user
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiting = deque()
+        self._per_user = defaultdict(int)
+        self._acquired_at = {}
+        # Moving average of how long a slot is held, for Retry-After
+        self._hold_seconds = 1.0
+        self._condition = threading.Condition()
+
+    def acquire(self, user_id):
+        """Take a slot for ``user_id``, waiting in the queue if need be. Returns a token, or None if rejected."""
+        with self._condition:
+            if self.per_user is not None and self._per_user[user_id] >= self.per_user:
+                self.rejected += 1
+                return None
+            if self._waiting or self.active >= self.max_active:
+                if len(self._waiting) >= self.max_queued or self.queue_timeout <= 0:
+                    self.rejected += 1
+                    return None
+                ticket = object()
+                self._waiting.append(ticket)
+                self._per_user[user_id] += 1
+                admitted = self._condition.wait_for(
+                    lambda: self._waiting[0] is ticket and self.active < self.max_active,
+                    self.queue_timeout
+                )
+                self._waiting.remove(ticket)
+                self._per_user[user_id] -= 1
+                # The next in line may be able to go too
+                self._condition.notify_all()
+                if not admitted:
+                    self.rejected += 1
+                    return None
+
+            token = object()
+            self.active += 1
+            self.admitted += 1
+            self._per_user[user_id] += 1
+            self._acquired_at[token] = (user_id, time.monotonic())
+            return token
+
+    def release(self, token):
+        with self._condition:
+            user_id, acquired_at = self._acquired_at.pop(token)
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * (time.monotonic() - acquired_at)
+            self.active -= 1
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+            self._condition.notify_all()
+
+    def retry_after(self):
+        """Seconds a rejected client should wait before retrying: about how long a slot is held."""
+        return min(60, max(1, math.ceil(self._hold_seconds)))
+
+    def stats(self):
+        with self._condition:
+            return {
+                'active': self.active,
+                'queued': len(self._waiting),
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
+
+
+class SingleFlight:
+    """Lets concurrent calls with the same key share one execution."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def run(self, key, fn):
+        """Call ``fn()``, unless a call with the same ``key`` is in progress, in which case wait for its result.
+
+        Returns the result and whether it was shared from another call. An
+        exception raised by ``fn`` is raised in every caller waiting on it.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class CachedAnswer:
+    def __init__(self, question, vector, answer, sources):
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+
+
+class AnswerCache:
+    """In-process cache of chat answers, matched by question embedding similarity.
+
+    Answers are grouped under a key of (session id, document version, chat
+    mode), so adding or removing a document changes the key and old answers
+    stop matching. A lookup returns the most similar cached question if its
+    cosine similarity is at least ``threshold``.
+    """
+
+    def __init__(self, threshold=0.95, max_keys=1000, max_entries_per_key=100):
+        self.threshold = threshold
+        self.max_keys = max_keys
+        self.max_entries_per_key = max_entries_per_key
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, key, vector):
+        vector = self._normalize(vector)
+        with self._lock:
+            entries = self._entries.get(key)
+            if entries:
+                self._entries.move_to_end(key)
+                similarities = np.stack([entry.vector for entry in entries]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    return entries[best]
+            self.misses += 1
+            return None
+
+    def store(self, key, question, vector, answer, sources):
+        entry = CachedAnswer(question, self._normalize(vector), answer, sources)
+        with self._lock:
+            entries = self._entries.setdefault(key, [])
+            self._entries.move_to_end(key)
+            entries.append(entry)
+            if len(entries) > self.max_entries_per_key:
+                entries.pop(0)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def invalidate_session(self, session_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'keys': len(self._entries),
+                'entries': sum(len(entries) for entries in self._entries.values()),
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
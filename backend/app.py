@@ -1,20 +1,46 @@
-from flask import Flask, request, jsonify, session as flask_session
+from flask import Flask, Response, g, request, jsonify, session as flask_session, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-from langchain_google_genai import GoogleGenerativeAI
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.memory import ConversationBufferMemory, ConversationBufferWindowMemory
-from langchain.chains import ConversationalRetrievalChain
-from langchain.prompts import PromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate
 import tempfile
-from models import db, User, Session, Document, Chat
-from sqlalchemy import text
-from datetime import datetime
+from models import db, User, Session, Document, Chat, IngestionJob, configure_sqlite, upgrade_schema
+from vectorstore_cache import VectorStoreCache
+from faiss_index import FaissIndexPolicy, VectorWriter
+from chunk_store import ChunkWriter
+from jobs import JobQueue
+from answer_cache import AnswerCache
+from history_cache import ChatHistoryCache
+from chat_writer import ChatWriteQueue
+from admission import AdmissionLimiter, SingleFlight
+from lexical_index import BM25Index, BM25Writer, reciprocal_rank_fusion
+from embedding_scheduler import ScheduledEmbeddings
+from fake_backends import FakeEmbeddings, FakeLLM
+from chat_pipeline import (
+    build_chat_prompt, condense_question, format_chat_history, format_documents, sse_event, summarize_chat_history
+)
+from context_assembly import assemble_context, estimate_tokens, select_recent_turns
+from ingestion import hash_file, iter_batches, iter_pdf_chunk_batches, parse_pdf
+from session_index import SessionIndex
+from pagination import get_page_size, paginate_newest_first
+from metrics import MetricsRegistry, RequestTrace
+from sqlalchemy import make_url, text
+from sqlalchemy.orm import joinedload, selectinload
+from datetime import datetime, timedelta
+import atexit
+import json
 import shutil
+import threading
+import time
+import uuid
+import multiprocessing
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+try:
+    import fcntl
+except ImportError:
+    # Windows runs the single-process development server, where the in-process locks are enough
+    fcntl = None
 
 app = Flask(__name__)
 CORS(app, 
@@ -24,29 +50,333 @@ CORS(app,
              "origins": ["http://localhost:5173"],
              "methods": ["GET", "POST", "PATCH", "DELETE", "OPTIONS"],
              "allow_headers": ["Content-Type", "Authorization"],
-             "expose_headers": ["Content-Type"],
+             "expose_headers": ["Content-Type", "X-Request-ID"],
              "supports_credentials": True,
              "allow_credentials": True
          }
      })
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///chat_app.db'
+# Load environment variables
+load_dotenv()
+# Relative SQLite paths are resolved against the instance folder
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///chat_app.db")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+# Seconds before a pooled connection is replaced; -1 keeps them
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# Commit chat turns in batches on a background thread instead of in the request
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "false").lower() == "true"
+CHAT_WRITE_BATCH_SIZE = int(os.getenv("CHAT_WRITE_BATCH_SIZE", 100))
+CHAT_WRITE_FLUSH_MS = int(os.getenv("CHAT_WRITE_FLUSH_MS", 50))
+
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+database_url = make_url(DATABASE_URL)
+if database_url.get_backend_name() != 'sqlite' or database_url.database not in (None, '', ':memory:'):
+    # In-memory SQLite uses a single shared connection, which takes no pool settings
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING
+    }
 app.config['SECRET_KEY'] = 'dev-key'  # Change in production
 db.init_app(app)
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        configure_sqlite(db.engine, SQLITE_BUSY_TIMEOUT_MS)
 
-# Load environment variables
-load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash")
+# "chain" runs ConversationalRetrievalChain, "lean" does one retrieval and one generation call
+CHAT_PIPELINE = os.getenv("CHAT_PIPELINE", "chain")
+# Also rewrite follow-up questions before retrieval in the lean pipeline (the chain pipeline
+# always does), optionally with a cheaper model
+CONDENSE_QUESTIONS = os.getenv("CONDENSE_QUESTIONS", "false").lower() == "true"
+CONDENSE_MODEL_NAME = os.getenv("CONDENSE_MODEL_NAME", GEMINI_MODEL_NAME)
+# Reuse answers to near-identical questions within a session
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+# "vector" (FAISS), "lexical" (BM25, no query embedding call) or "hybrid" (rank fusion of both)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+RETRIEVAL_MODES = ('vector', 'lexical', 'hybrid')
+# Candidates taken from each retriever before hybrid rank fusion
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", 20))
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "models/embedding-001")
+# "google" for the Gemini embedding API, "fake" for deterministic offline embeddings
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "google")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 100))
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", 4))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", 1500))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 6))
+FAKE_EMBEDDING_LATENCY_MS = int(os.getenv("FAKE_EMBEDDING_LATENCY_MS", 0))
+# "fake" answers locally, without calling Gemini, for offline runs and benchmarks
+LLM_BACKEND = os.getenv("LLM_BACKEND", "google")
+FAKE_LLM_LATENCY_MS = int(os.getenv("FAKE_LLM_LATENCY_MS", 0))
+FAKE_LLM_TOKEN_LATENCY_MS = int(os.getenv("FAKE_LLM_TOKEN_LATENCY_MS", 0))
 CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", 10))
 CHAT_LENGTH_WARNING = int(os.getenv("CHAT_LENGTH_WARNING", 8))
 CHAT_LENGTH_ALERT = int(os.getenv("CHAT_LENGTH_ALERT", 15))
+HISTORY_CACHE_SESSIONS = int(os.getenv("HISTORY_CACHE_SESSIONS", 1000))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1000))
+# Retrieval candidates considered when filling a mode's context budget
+CONTEXT_FETCH_K = int(os.getenv("CONTEXT_FETCH_K", 12))
+REQUEST_LOGS = os.getenv("REQUEST_LOGS", "true").lower() == "true"
+SESSIONS_PAGE_SIZE = int(os.getenv("SESSIONS_PAGE_SIZE", 50))
+MESSAGES_PAGE_SIZE = int(os.getenv("MESSAGES_PAGE_SIZE", 50))
+MAX_PAGE_SIZE = 200
+VECTORSTORE_CACHE_MB = int(os.getenv("VECTORSTORE_CACHE_MB", 512))
+# Admission control, per worker process. Chats over the limits wait in a bounded
+# queue for up to CHAT_QUEUE_TIMEOUT_SECONDS; beyond that they get a 429
+CHAT_MAX_ACTIVE = int(os.getenv("CHAT_MAX_ACTIVE", 64))
+CHAT_MAX_QUEUED = int(os.getenv("CHAT_MAX_QUEUED", 128))
+CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", 10))
+CHAT_MAX_PER_USER = int(os.getenv("CHAT_MAX_PER_USER", 4))
+# Ingestion jobs (a bulk upload is one job) that may be queued or running, in all and per user
+UPLOAD_MAX_JOBS = int(os.getenv("UPLOAD_MAX_JOBS", 32))
+UPLOAD_MAX_JOBS_PER_USER = int(os.getenv("UPLOAD_MAX_JOBS_PER_USER", 2))
+# Identical /chat requests in flight at the same time share one answer
+CHAT_COALESCING = os.getenv("CHAT_COALESCING", "true").lower() == "true"
+# Before serving, wsgi.py loads the indexes of this many recently active sessions
+PREWARM_SESSIONS = int(os.getenv("PREWARM_SESSIONS", 0))
+LEXICAL_INDEX_CACHE_MB = int(os.getenv("LEXICAL_INDEX_CACHE_MB", 128))
+# "auto" picks flat, hnsw, ivf or pq from the session's vector count; any of those pins one type
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+# Vector encoding for flat, HNSW and IVF indexes: float32, float16 or int8
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float16")
+FAISS_HNSW_MIN_VECTORS = int(os.getenv("FAISS_HNSW_MIN_VECTORS", 50_000))
+FAISS_IVF_MIN_VECTORS = int(os.getenv("FAISS_IVF_MIN_VECTORS", 500_000))
+FAISS_PQ_MIN_VECTORS = int(os.getenv("FAISS_PQ_MIN_VECTORS", 2_000_000))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", 64))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", 16))
+FAISS_MMAP_MIN_MB = int(os.getenv("FAISS_MMAP_MIN_MB", 64))
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", 2))
+# Chunks embedded and added to the index per step while streaming a PDF
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", 64))
+BULK_UPLOAD_MAX_FILES = int(os.getenv("BULK_UPLOAD_MAX_FILES", 50))
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", os.cpu_count() or 1))
+# Embedding cache lives next to chat_app.db in the instance folder by default
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(app.instance_path, "embedding_cache.db"))
+
+# Model clients are created on first use by get_llm(), get_condense_llm() and
+# get_embeddings(): the Google client libraries take seconds to import, which
+# workers and scripts that never call Gemini shouldn't pay for
+llm = None
+condense_llm = None
+base_embeddings = None
+embedding_store = None
+embeddings = None
+model_clients_lock = threading.Lock()
+
+def create_llm(model_name):
+    if LLM_BACKEND == "fake":
+        return FakeLLM(
+            latency_seconds=FAKE_LLM_LATENCY_MS / 1000,
+            token_latency_seconds=FAKE_LLM_TOKEN_LATENCY_MS / 1000
+        )
+    from langchain_google_genai import GoogleGenerativeAI
+    return GoogleGenerativeAI(model=model_name, google_api_key=GOOGLE_API_KEY)
+
+def get_llm():
+    """The model that writes answers."""
+    global llm
+    if llm is None:
+        with model_clients_lock:
+            if llm is None:
+                llm = create_llm(GEMINI_MODEL_NAME)
+    return llm
 
-# Initialize the models separately
-llm = GoogleGenerativeAI(model=GEMINI_MODEL_NAME, google_api_key=GOOGLE_API_KEY)
-embeddings = GoogleGenerativeAIEmbeddings(
-    model=EMBEDDING_MODEL_NAME,
-    google_api_key=GOOGLE_API_KEY
+def get_condense_llm():
+    """The model that condenses questions and summarizes history; the answer model unless CONDENSE_MODEL_NAME differs."""
+    global condense_llm
+    if condense_llm is None:
+        if LLM_BACKEND == "fake" or CONDENSE_MODEL_NAME == GEMINI_MODEL_NAME:
+            model = get_llm()
+        else:
+            model = create_llm(CONDENSE_MODEL_NAME)
+        with model_clients_lock:
+            if condense_llm is None:
+                condense_llm = model
+    return condense_llm
+
+def create_embedding_backend():
+    if EMBEDDING_BACKEND == "fake":
+        return FakeEmbeddings(latency_seconds=FAKE_EMBEDDING_LATENCY_MS / 1000)
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(
+        model=EMBEDDING_MODEL_NAME,
+        google_api_key=GOOGLE_API_KEY
+    )
+
+def get_embeddings():
+    """The embedding model, batched, rate-limited and cached on disk."""
+    global base_embeddings, embedding_store, embeddings
+    if embeddings is not None:
+        return embeddings
+    with model_clients_lock:
+        if embeddings is not None:
+            return embeddings
+        from langchain_community.storage import SQLStore
+        from langchain.embeddings import CacheBackedEmbeddings
+
+        # Batch, rate-limit and retry embedding requests to the backend
+        base_embeddings = ScheduledEmbeddings(
+            create_embedding_backend(),
+            batch_size=EMBEDDING_BATCH_SIZE,
+            max_in_flight=EMBEDDING_MAX_IN_FLIGHT,
+            requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+            max_retries=EMBEDDING_MAX_RETRIES
+        )
+
+        # Cache embeddings by (model name, chunk text hash) so re-uploads and
+        # duplicate documents don't go back to the embedding API
+        embedding_store = SQLStore(namespace="embeddings", db_url=f"sqlite:///{EMBEDDING_CACHE_PATH}")
+        # Ingestion workers write to it concurrently
+        configure_sqlite(embedding_store.engine, SQLITE_BUSY_TIMEOUT_MS)
+        embedding_store.create_schema()
+        embeddings = CacheBackedEmbeddings.from_bytes_store(
+            base_embeddings,
+            embedding_store,
+            namespace=EMBEDDING_MODEL_NAME,
+            query_embedding_cache=True
+        )
+    return embeddings
+
+faiss_index_policy = FaissIndexPolicy(
+    index_type=FAISS_INDEX_TYPE,
+    vector_dtype=VECTOR_DTYPE,
+    hnsw_min_vectors=FAISS_HNSW_MIN_VECTORS,
+    ivf_min_vectors=FAISS_IVF_MIN_VECTORS,
+    pq_min_vectors=FAISS_PQ_MIN_VECTORS,
+    hnsw_ef_search=FAISS_HNSW_EF_SEARCH,
+    ivf_nprobe=FAISS_IVF_NPROBE,
+    mmap_min_bytes=FAISS_MMAP_MIN_MB * 1024 * 1024
+)
+
+# Loaded vectorstores are kept in memory so chat turns skip the disk load
+vectorstore_cache = VectorStoreCache(max_bytes=VECTORSTORE_CACHE_MB * 1024 * 1024)
+
+def save_job_record(job):
+    """Write an ingestion job's status and progress to the database, where every worker can read them."""
+    try:
+        # A separate app context has its own database session, leaving the job's or request's alone
+        with app.app_context():
+            try:
+                record = db.session.get(IngestionJob, job.id)
+                if record is None:
+                    record = IngestionJob(
+                        id=job.id, session_id=job.info['session_id'], info=job.info, created_at=job.created_at
+                    )
+                    db.session.add(record)
+                job_data = job.to_dict()
+                record.status = job_data['status']
+                record.progress = job_data['progress']
+                record.error = job_data['error']
+                record.finished_at = job.finished_at
+                if job.finished_at:
+                    cutoff = datetime.utcnow() - timedelta(seconds=ingestion_jobs.retention_seconds)
+                    IngestionJob.query.filter(IngestionJob.finished_at < cutoff).delete()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+    except Exception as e:
+        # Only progress reporting suffers; the ingestion itself carries on
+        print(f"Error saving status of job {job.id}: {str(e)}")
+
+# Uploads are parsed and embedded off the request thread. Each worker process runs its own
+# jobs, and their status is also saved to the database so /jobs answers from any worker.
+ingestion_jobs = JobQueue(max_workers=INGESTION_WORKERS, thread_name_prefix='ingest', on_change=save_job_record)
+lexical_index_cache = VectorStoreCache(
+    max_bytes=LEXICAL_INDEX_CACHE_MB * 1024 * 1024,
+    sizeof=lambda lexical_index: lexical_index.estimate_bytes()
+)
+answer_cache = AnswerCache(threshold=ANSWER_CACHE_THRESHOLD)
+chat_history_cache = ChatHistoryCache(window=CHAT_HISTORY_WINDOW, max_sessions=HISTORY_CACHE_SESSIONS)
+chat_writer = None
+if CHAT_WRITE_BEHIND:
+    chat_writer = ChatWriteQueue(app, batch_size=CHAT_WRITE_BATCH_SIZE, flush_interval=CHAT_WRITE_FLUSH_MS / 1000)
+    # Write out queued turns when the process exits
+    atexit.register(chat_writer.close)
+# History summaries are written after the response, one at a time
+summary_jobs = JobQueue(max_workers=1, thread_name_prefix='summarize')
+pending_summaries = set()
+pending_summaries_lock = threading.Lock()
+pdf_parsing_pool = None
+pdf_parsing_pool_lock = threading.Lock()
+# Set by warm_up()
+app_ready = threading.Event()
+chat_limiter = AdmissionLimiter(
+    max_active=CHAT_MAX_ACTIVE,
+    max_queued=CHAT_MAX_QUEUED,
+    per_user=CHAT_MAX_PER_USER,
+    queue_timeout=CHAT_QUEUE_TIMEOUT_SECONDS
+)
+# Upload slots are held until the ingestion job finishes; the job queue is the wait queue
+upload_limiter = AdmissionLimiter(max_active=UPLOAD_MAX_JOBS, per_user=UPLOAD_MAX_JOBS_PER_USER)
+chat_flights = SingleFlight()
+
+# Served in Prometheus text format at /metrics
+metrics = MetricsRegistry()
+request_duration = metrics.histogram(
+    'codex_request_duration_seconds', 'Time to serve a request, until a streamed response finishes',
+    ['endpoint', 'method', 'status']
+)
+stage_duration = metrics.histogram(
+    'codex_stage_duration_seconds', 'Time spent in each stage of a request or ingestion job', ['endpoint', 'stage']
+)
+llm_tokens = metrics.counter(
+    'codex_llm_tokens_total', 'Estimated tokens sent to and generated by Gemini', ['endpoint', 'direction']
+)
+errors = metrics.counter('codex_errors_total', 'Requests and ingestion jobs that failed', ['endpoint'])
+CACHES = {
+    'vectorstore': vectorstore_cache,
+    'lexical': lexical_index_cache,
+    'answers': answer_cache,
+    'history': chat_history_cache
+}
+metrics.callback(
+    'codex_cache_hits_total', 'Cache lookups that were hits', ['cache'],
+    lambda: {(name, ): cache.hits for name, cache in CACHES.items()}, type='counter'
+)
+metrics.callback(
+    'codex_cache_misses_total', 'Cache lookups that were misses', ['cache'],
+    lambda: {(name, ): cache.misses for name, cache in CACHES.items()}, type='counter'
+)
+if chat_writer:
+    metrics.callback(
+        'codex_chat_writes_queued', 'Chat turns waiting to be committed by the write-behind queue', [],
+        lambda: {(): chat_writer.stats()['queued']}
+    )
+    metrics.callback(
+        'codex_chat_write_batches_total', 'Batches committed by the write-behind queue', [],
+        lambda: {(): chat_writer.batches}, type='counter'
+    )
+LIMITERS = {'chat': chat_limiter, 'upload': upload_limiter}
+metrics.callback(
+    'codex_admission_active', 'Requests holding an admission slot', ['kind'],
+    lambda: {(name, ): limiter.active for name, limiter in LIMITERS.items()}
+)
+metrics.callback(
+    'codex_admission_queued', 'Requests waiting for an admission slot', ['kind'],
+    lambda: {(name, ): limiter.stats()['queued'] for name, limiter in LIMITERS.items()}
+)
+metrics.callback(
+    'codex_admission_rejected_total', 'Requests rejected with 429', ['kind'],
+    lambda: {(name, ): limiter.rejected for name, limiter in LIMITERS.items()}, type='counter'
+)
+metrics.callback(
+    'codex_chat_coalesced_total', 'Chat requests answered with the result of an identical one in flight', [],
+    lambda: {(): chat_flights.shared}, type='counter'
+)
+metrics.callback(
+    'codex_cache_bytes', 'Estimated memory held by a cache', ['cache'],
+    lambda: {(name, ): CACHES[name].current_bytes for name in ('vectorstore', 'lexical')}
 )
 
 # Add these constants at the top of the file
@@ -63,6 +393,290 @@ CHAT_MODES = {
                   emphasis to structure detailed responses. Break down complex information into clear sections."""
 }
 
+# Tokens of retrieved document text each mode may send to Gemini
+CONTEXT_TOKEN_BUDGETS = {
+    'concise': int(os.getenv("CONTEXT_TOKENS_CONCISE", 500)),
+    'balanced': int(os.getenv("CONTEXT_TOKENS_BALANCED", 1000)),
+    'detailed': int(os.getenv("CONTEXT_TOKENS_DETAILED", 2000))
+}
+
+# Prompts are built once at startup rather than on every chat request
+CHAT_PROMPTS = {mode: build_chat_prompt(template) for mode, template in CHAT_MODES.items()}
+
+def get_vectorstore_path(session_id):
+    return f"vectorstores/session_{session_id}"
+
+DOCUMENT_STORES_PATH = "vectorstores/documents"
+# Builds write a batch every few seconds; one untouched for this long was interrupted
+STALE_BUILD_SECONDS = 3600
+
+def get_document_store_path(content_hash):
+    return f"{DOCUMENT_STORES_PATH}/{content_hash}"
+
+# Deletes from the same pre-dedup session index must not interleave their writes
+session_index_locks = defaultdict(threading.Lock)
+# Creating a document store, referencing it and garbage collecting it are serialized per content hash,
+# across threads and, through lock files, across worker processes. Hashes share a fixed set of locks.
+DOCUMENT_STORE_LOCK_STRIPES = 64
+document_store_locks = [threading.Lock() for _ in range(DOCUMENT_STORE_LOCK_STRIPES)]
+
+@contextmanager
+def document_store_lock(content_hash):
+    """Hold the lock guarding one document store, in this process and in every other worker."""
+    stripe = int(content_hash[:8], 16) % DOCUMENT_STORE_LOCK_STRIPES
+    # Taken first, so only one thread or greenlet per process ever blocks on the file lock
+    with document_store_locks[stripe]:
+        if fcntl is None:
+            yield
+            return
+        lock_dir = os.path.join(DOCUMENT_STORES_PATH, '.locks')
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, f"{stripe}.lock"), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+def read_session_vectorstore(session_id, mmap=False):
+    """Load a pre-dedup session index from disk. Writers need ``mmap=False``: mapped indexes are read-only."""
+    return faiss_index_policy.load(get_vectorstore_path(session_id), get_embeddings(), mmap=mmap)
+
+def load_session_vectorstore(session_id):
+    """Return the session's vectorstore from the cache, loading it from disk on a miss."""
+    def load():
+        # Saves replace the index and chunk files one by one; don't read in between
+        with session_index_locks[int(session_id)]:
+            return read_session_vectorstore(session_id, mmap=True)
+
+    return vectorstore_cache.get_or_load(int(session_id), load)
+
+def save_session_vectorstore(session_id, vectorstore):
+    """Save a session index, switching its index type if its size calls for it, and cache it."""
+    vectorstore_path = get_vectorstore_path(session_id)
+    faiss_index_policy.fit(vectorstore)
+    faiss_index_policy.save(vectorstore, vectorstore_path)
+    if faiss_index_policy.should_mmap(vectorstore_path):
+        # Let the next chat map it from disk instead of keeping this resident copy
+        return
+    vectorstore_cache.put(session_id, vectorstore)
+
+def iter_vectorstore_chunks(vectorstore):
+    """Yield (docstore id, Document) for every vector, in index order."""
+    for i in range(vectorstore.index.ntotal):
+        docstore_id = vectorstore.index_to_docstore_id[i]
+        yield docstore_id, vectorstore.docstore.search(docstore_id)
+
+def build_lexical_index(vectorstore):
+    lexical_index = BM25Index()
+    chunks = list(iter_vectorstore_chunks(vectorstore))
+    lexical_index.add([docstore_id for docstore_id, _ in chunks], [doc.page_content for _, doc in chunks])
+    return lexical_index
+
+def read_session_lexical_index(session_id):
+    """Load the session's BM25 index, building it in memory for sessions indexed before it existed."""
+    vectorstore_path = get_vectorstore_path(session_id)
+    if BM25Index.exists(vectorstore_path):
+        return BM25Index.load(vectorstore_path)
+    return build_lexical_index(load_session_vectorstore(session_id))
+
+def load_session_lexical_index(session_id):
+    return lexical_index_cache.get_or_load(
+        int(session_id),
+        lambda: read_session_lexical_index(session_id)
+    )
+
+def document_store_exists(content_hash):
+    return os.path.exists(get_document_store_path(content_hash))
+
+def load_document_store(content_hash):
+    return vectorstore_cache.get_or_load(
+        content_hash,
+        lambda: faiss_index_policy.load(get_document_store_path(content_hash), get_embeddings(), mmap=True)
+    )
+
+def load_document_lexical_index(content_hash):
+    return lexical_index_cache.get_or_load(
+        content_hash,
+        lambda: BM25Index.load(get_document_store_path(content_hash))
+    )
+
+def build_document_store(content_hash, chunk_batches, on_batch=None):
+    """Embed one document's chunks batch by batch and write its store to a new temporary folder.
+
+    Each batch's chunks, vectors and BM25 term counts are written out as
+    soon as it is embedded, so memory use does not grow with the document's
+    length until the FAISS index is built at the end. Returns the folder,
+    for ``publish_document_store``.
+    """
+    tmp_path = f"{get_document_store_path(content_hash)}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_path)
+    try:
+        chunk_writer = ChunkWriter(tmp_path)
+        vector_writer = VectorWriter(faiss_index_policy, tmp_path)
+        lexical_writer = BM25Writer(tmp_path)
+        for batch in chunk_batches:
+            # Chunk ids only need to be unique among the documents of one session
+            for chunk in batch:
+                chunk.metadata['content_hash'] = content_hash
+            start = vector_writer.count
+            ids = [f"{content_hash[:16]}-chunk{i}" for i in range(start, start + len(batch))]
+            texts = [chunk.page_content for chunk in batch]
+
+            vector_writer.add(get_embeddings().embed_documents(texts))
+            chunk_writer.add(zip(ids, batch))
+            lexical_writer.add(ids, texts)
+            if on_batch:
+                on_batch(len(batch))
+
+        if not vector_writer.count:
+            raise ValueError("No text could be extracted from the PDF")
+        chunk_writer.close()
+        vector_writer.close()
+        lexical_writer.close()
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return tmp_path
+
+def publish_document_store(content_hash, tmp_path):
+    """Move a store written by ``build_document_store`` into place under its content hash.
+
+    The rename makes the store appear complete or not at all. Stores never
+    change once written; if the same file finished indexing first
+    elsewhere, that copy is kept.
+    """
+    store_path = get_document_store_path(content_hash)
+    with document_store_lock(content_hash):
+        if os.path.exists(store_path):
+            shutil.rmtree(tmp_path)
+            return
+        os.rename(tmp_path, store_path)
+
+def release_document_stores(content_hashes):
+    """Delete the document stores that no Document row references any more."""
+    for content_hash in set(content_hashes):
+        if not content_hash:
+            continue
+        with document_store_lock(content_hash):
+            if Document.query.filter_by(content_hash=content_hash).first():
+                continue
+            vectorstore_cache.invalidate(content_hash)
+            lexical_index_cache.invalidate(content_hash)
+            shutil.rmtree(get_document_store_path(content_hash), ignore_errors=True)
+            print(f"Deleted unreferenced document store {content_hash}")
+
+def remove_interrupted_builds(max_age_seconds=STALE_BUILD_SECONDS):
+    """Delete temporary document store folders that ingestion jobs stopped writing to, e.g. when a worker crashed.
+
+    Run at startup. Other workers may be building stores at the same time,
+    so only folders with no file written for ``max_age_seconds`` are removed.
+    """
+    if not os.path.isdir(DOCUMENT_STORES_PATH):
+        return
+    now = time.time()
+    for entry in os.scandir(DOCUMENT_STORES_PATH):
+        if '.tmp-' not in entry.name:
+            continue
+        try:
+            last_write = max([entry.stat().st_mtime] + [child.stat().st_mtime for child in os.scandir(entry.path)])
+        except OSError:
+            # Published or removed since it was listed
+            continue
+        if now - last_write >= max_age_seconds:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            print(f"Deleted interrupted document store build {entry.name}")
+
+def session_has_index(session):
+    if any(d.status == 'ready' and d.content_hash for d in session.documents):
+        return True
+    return os.path.exists(get_vectorstore_path(session.id))
+
+def load_session_index(session):
+    """Open the indexes of the session's ready documents, or None if it has none.
+
+    Sessions indexed before documents were stored by content hash also
+    search their own session index.
+    """
+    keys = sorted({d.content_hash for d in session.documents if d.status == 'ready' and d.content_hash})
+    vectorstores = [load_document_store(key) for key in keys]
+    lexical_index_loaders = [lambda key=key: load_document_lexical_index(key) for key in keys]
+    if os.path.exists(get_vectorstore_path(session.id)):
+        vectorstores.append(load_session_vectorstore(session.id))
+        lexical_index_loaders.append(lambda: load_session_lexical_index(session.id))
+    if not vectorstores:
+        return None
+    return SessionIndex(vectorstores, lexical_index_loaders)
+
+def remove_document_chunks(session_id, document_id):
+    """Remove one document's vectors from a pre-dedup session index. Returns the number removed."""
+    vectorstore_path = get_vectorstore_path(session_id)
+    with session_index_locks[session_id]:
+        if not os.path.exists(vectorstore_path):
+            return 0
+
+        vectorstore = read_session_vectorstore(session_id)
+        ids = [
+            docstore_id for docstore_id in vectorstore.index_to_docstore_id.values()
+            if vectorstore.docstore.search(docstore_id).metadata.get('document_id') == document_id
+        ]
+        if ids:
+            faiss_index_policy.remove(vectorstore, ids)
+
+        vectorstore_cache.invalidate(session_id)
+        lexical_index_cache.invalidate(session_id)
+        answer_cache.invalidate_session(session_id)
+        if vectorstore.index.ntotal == 0:
+            shutil.rmtree(vectorstore_path)
+        else:
+            if BM25Index.exists(vectorstore_path):
+                lexical_index = BM25Index.load(vectorstore_path)
+                lexical_index.remove(ids)
+            else:
+                lexical_index = build_lexical_index(vectorstore)
+            save_session_vectorstore(session_id, vectorstore)
+            lexical_index.save(vectorstore_path)
+            lexical_index_cache.put(session_id, lexical_index)
+        return len(ids)
+
+@app.before_request
+def start_request_trace():
+    g.trace = RequestTrace(
+        request.endpoint or 'unknown',
+        request_id=request.headers.get('X-Request-ID'),
+        stage_histogram=stage_duration
+    )
+
+@app.after_request
+def finish_request_trace(response):
+    trace = g.get('trace')
+    if trace is None:
+        return response
+    response.headers['X-Request-ID'] = trace.request_id
+    fields = {'method': request.method, 'path': request.path, 'status': response.status_code}
+    if response.is_streamed:
+        # Still being generated here, so finish once the server closes it
+        response.call_on_close(lambda: finish_trace(trace, **fields))
+    else:
+        finish_trace(trace, **fields)
+    return response
+
+def finish_trace(trace, **fields):
+    """Record a finished request or job's duration and errors, and log it as one JSON line."""
+    if 'method' in fields:
+        request_duration.observe(
+            trace.elapsed(), endpoint=trace.endpoint, method=fields['method'], status=fields['status']
+        )
+    if trace.error or fields.get('status', 200) >= 500:
+        errors.inc(endpoint=trace.endpoint)
+    if REQUEST_LOGS:
+        print(trace.to_log(**fields))
+
+def count_llm_tokens(prompt_text, answer):
+    """Add a Gemini call's estimated input and output tokens to the metrics and the request log."""
+    input_tokens, output_tokens = estimate_tokens(prompt_text), estimate_tokens(answer)
+    llm_tokens.inc(input_tokens, endpoint=g.trace.endpoint, direction='input')
+    llm_tokens.inc(output_tokens, endpoint=g.trace.endpoint, direction='output')
+    g.trace.count('input_tokens', input_tokens)
+    g.trace.count('output_tokens', output_tokens)
+
 @app.route('/register', methods=['POST'])
 def register():
     try:
@@ -132,12 +746,64 @@ def auth_required(f):
     wrapper.__name__ = f.__name__
     return wrapper
 
+def admission_required(limiter):
+    """Answer 429 with Retry-After when ``limiter`` has no slot for the user's request.
+
+    The slot is held until the response has been sent (for a stream, until
+    it finishes), unless the route hands it to a job with hand_admission_to_job().
+    """
+    def decorator(f):
+        def wrapper(*args, **kwargs):
+            with g.trace.stage('admission'):
+                token = limiter.acquire(flask_session['user_id'])
+            if token is None:
+                g.trace.count('rejected')
+                response = jsonify({'error': 'Too many requests, please retry shortly'})
+                response.headers['Retry-After'] = str(limiter.retry_after())
+                return response, 429
+
+            g.admission = (limiter, token)
+            try:
+                response = app.make_response(f(*args, **kwargs))
+            except BaseException:
+                if g.pop('admission', None):
+                    limiter.release(token)
+                raise
+            # Gone if the route handed the slot to a job
+            if g.pop('admission', None):
+                if response.is_streamed:
+                    # Runs after the request context is gone, so it mustn't use g
+                    response.call_on_close(lambda: limiter.release(token))
+                else:
+                    limiter.release(token)
+            return response
+        wrapper.__name__ = f.__name__
+        return wrapper
+    return decorator
+
+def hand_admission_to_job():
+    """Keep the request's admission slot until a job finishes. Returns the job's on_done callback."""
+    limiter, token = g.pop('admission')
+    return lambda job: limiter.release(token)
+
 @app.route('/sessions', methods=['GET'])
 @auth_required
 def get_sessions():
+    """List the user's sessions newest first, one page at a time.
+
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page.
+    """
     try:
-        sessions = Session.query.filter_by(user_id=flask_session['user_id']).all()
-        return jsonify({'sessions': [s.to_dict() for s in sessions]}), 200
+        limit = get_page_size(request.args.get('limit'), SESSIONS_PAGE_SIZE, MAX_PAGE_SIZE)
+        # Load every session's documents in one extra query instead of one per session
+        query = Session.query.filter_by(user_id=flask_session['user_id']).options(selectinload(Session.documents))
+        sessions, next_cursor = paginate_newest_first(query, Session, limit, request.args.get('cursor'))
+        return jsonify({
+            'sessions': [s.to_dict() for s in sessions],
+            'next_cursor': next_cursor
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -163,6 +829,7 @@ def create_session():
 
 @app.route('/upload', methods=['POST'])
 @auth_required
+@admission_required(upload_limiter)
 def upload_file():
     try:
         user_id = flask_session['user_id']
@@ -174,194 +841,760 @@ def upload_file():
         if not file.filename.endswith('.pdf'):
             return jsonify({'error': 'Only PDF files are allowed'}), 400
 
-        # Create new session or use existing one
-        session_id = request.form.get('session_id')
-        if session_id:
-            session = Session.query.filter_by(id=session_id, user_id=user_id).first()
-            if not session:
-                return jsonify({'error': 'Invalid session'}), 400
+        with g.trace.stage('session_load'):
+            session = get_upload_session(user_id, request.form.get('session_id'))
+        if not session:
+            return jsonify({'error': 'Invalid session'}), 400
+
+        with g.trace.stage('save_upload'):
+            file_path = save_upload(file)
+        with g.trace.stage('hash'):
+            content_hash = hash_file(file_path)
+        with g.trace.stage('db_commit'):
+            document = add_upload_document(session, file.filename, content_hash)
+
+        # A file that was indexed before, in any session, is ready straight away
+        job = None
+        if document.status == 'ready':
+            g.trace.count('duplicate_uploads')
+            os.unlink(file_path)
         else:
-            session = Session(user_id=user_id)
-            db.session.add(session)
-            db.session.flush()
+            with g.trace.stage('enqueue'):
+                job = ingestion_jobs.submit(
+                    ingest_document, document.id, document.content_hash, file_path,
+                    on_done=hand_admission_to_job(),
+                    document_id=document.id,
+                    session_id=session.id
+                )
+
+        return jsonify({
+            'success': True,
+            'session_id': session.id,
+            'job_id': job.id if job else None,
+            'document': {
+                'id': document.id,
+                'filename': document.filename,
+                'uploaded_at': document.uploaded_at.isoformat(),
+                'status': document.status
+            }
+        }), 202 if job else 201
+
+    except Exception as e:
+        print(f"Upload error: {str(e)}")
+        g.trace.error = str(e)
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/upload/bulk', methods=['POST'])
+@auth_required
+@admission_required(upload_limiter)
+def upload_files_bulk():
+    try:
+        user_id = flask_session['user_id']
+
+        files = request.files.getlist('files')
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+        if len(files) > BULK_UPLOAD_MAX_FILES:
+            return jsonify({'error': f'At most {BULK_UPLOAD_MAX_FILES} files can be uploaded at once'}), 400
+        if not all(file.filename.endswith('.pdf') for file in files):
+            return jsonify({'error': 'Only PDF files are allowed'}), 400
+
+        session = get_upload_session(user_id, request.form.get('session_id'))
+        if not session:
+            return jsonify({'error': 'Invalid session'}), 400
+
+        documents = []
+        uploads = []
+        for file in files:
+            file_path = save_upload(file)
+            document = add_upload_document(session, file.filename, hash_file(file_path))
+            documents.append(document)
+            if document.status == 'ready':
+                os.unlink(file_path)
+            else:
+                uploads.append((document.id, document.content_hash, file_path))
+
+        job = None
+        if uploads:
+            job = ingestion_jobs.submit(
+                ingest_documents_bulk, uploads,
+                on_done=hand_admission_to_job(),
+                document_ids=[document_id for document_id, _, _ in uploads],
+                session_id=session.id
+            )
+
+        return jsonify({
+            'success': True,
+            'session_id': session.id,
+            'job_id': job.id if job else None,
+            'documents': [{
+                'id': document.id,
+                'filename': document.filename,
+                'uploaded_at': document.uploaded_at.isoformat(),
+                'status': document.status
+            } for document in documents]
+        }), 202 if job else 201
 
-        # Save document info
+    except Exception as e:
+        print(f"Bulk upload error: {str(e)}")
+        g.trace.error = str(e)
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def get_upload_session(user_id, session_id):
+    """Return the user's session to upload into, creating one if no id was given."""
+    if session_id:
+        return Session.query.filter_by(id=session_id, user_id=user_id).first()
+
+    session = Session(user_id=user_id)
+    db.session.add(session)
+    db.session.flush()
+    return session
+
+def add_upload_document(session, filename, content_hash):
+    """Create the Document row for an upload, already ready if its content is indexed."""
+    # Hold the hash's lock so the store can't be garbage collected before the row exists
+    with document_store_lock(content_hash):
         document = Document(
-            filename=file.filename,
+            filename=filename,
             session_id=session.id,
-            uploaded_at=datetime.utcnow()
+            uploaded_at=datetime.utcnow(),
+            status='ready' if document_store_exists(content_hash) else 'pending',
+            content_hash=content_hash
         )
         db.session.add(document)
         db.session.commit()
+    return document
 
-        # Process the file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            try:
-                file.save(tmp_file.name)
-                loader = PyPDFLoader(tmp_file.name)
-                documents = loader.load()
-                
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000,
-                    chunk_overlap=200
-                )
-                texts = text_splitter.split_documents(documents)
-                vectorstore = FAISS.from_documents(texts, embeddings)
-                
-                vectorstore_path = f"vectorstores/session_{session.id}"
-                os.makedirs("vectorstores", exist_ok=True)
-                vectorstore.save_local(vectorstore_path)
-                
-                return jsonify({
-                    'success': True,
-                    'session_id': session.id,
-                    'document': {
-                        'id': document.id,
-                        'filename': document.filename,
-                        'uploaded_at': document.uploaded_at.isoformat()
-                    }
-                }), 200
+def save_upload(file):
+    """Keep an uploaded file on disk until its ingestion job has processed it."""
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    fd, file_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix='.pdf')
+    os.close(fd)
+    file.save(file_path)
+    return file_path
 
-            except Exception as e:
-                print(f"Error processing file: {str(e)}")
-                db.session.rollback()
-                return jsonify({'error': str(e)}), 500
-            finally:
+def get_pdf_parsing_pool():
+    """Process pool for CPU-bound PDF parsing, created on first bulk upload."""
+    global pdf_parsing_pool
+    with pdf_parsing_pool_lock:
+        if pdf_parsing_pool is None:
+            # spawn, not fork: forking a process that runs gRPC and worker threads isn't safe
+            pdf_parsing_pool = ProcessPoolExecutor(
+                max_workers=PDF_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return pdf_parsing_pool
+
+def ingest_documents_bulk(job, uploads):
+    """Parse many PDFs in parallel on the process pool and save a document store for each.
+
+    ``uploads`` are (document id, content hash, file path) tuples; files with
+    the same content are parsed and embedded once.
+    """
+    trace = RequestTrace('ingest_bulk', request_id=job.id, stage_histogram=stage_duration)
+    with app.app_context():
+        try:
+            document_ids_by_hash = defaultdict(list)
+            file_paths = {}
+            for document_id, content_hash, file_path in uploads:
+                set_document_status(document_id, 'processing')
+                document_ids_by_hash[content_hash].append(document_id)
+                file_paths.setdefault(content_hash, file_path)
+            job.update(files_parsed=0, pages_parsed=0, chunks_embedded=0, index_saved=False)
+
+            pool = get_pdf_parsing_pool()
+            futures = {
+                pool.submit(parse_pdf, file_path): content_hash
+                for content_hash, file_path in file_paths.items()
+                if not document_store_exists(content_hash)
+            }
+
+            # Embed and save each file as soon as its parse finishes, in completion order
+            failed = set()
+            for future in as_completed(futures):
+                content_hash = futures[future]
                 try:
-                    os.unlink(tmp_file.name)
-                except:
+                    page_count, chunks = future.result()
+                    job.increment('files_parsed')
+                    job.increment('pages_parsed', page_count)
+                    with trace.stage('index_build'):
+                        document_store_path = build_document_store(
+                            content_hash,
+                            iter_batches(chunks, INGESTION_BATCH_SIZE),
+                            on_batch=lambda count: job.increment('chunks_embedded', count)
+                        )
+                    with trace.stage('index_save'):
+                        publish_document_store(content_hash, document_store_path)
+                except Exception as e:
+                    print(f"Error processing document {content_hash}: {str(e)}")
+                    failed.add(content_hash)
+
+            if len(failed) == len(document_ids_by_hash):
+                raise ValueError("None of the uploaded files could be processed")
+            job.update(index_saved=True)
+
+            released = []
+            for content_hash, document_ids in document_ids_by_hash.items():
+                for document_id in document_ids:
+                    if not set_document_status(document_id, 'failed' if content_hash in failed else 'ready'):
+                        released.append(content_hash)
+            release_document_stores(released)
+        except Exception as e:
+            trace.error = str(e)
+            db.session.rollback()
+            for document_id, _, _ in uploads:
+                document = db.session.get(Document, document_id)
+                if document and document.status != 'ready':
+                    set_document_status(document_id, 'failed')
+            raise
+        finally:
+            db.session.remove()
+            for _, _, file_path in uploads:
+                try:
+                    os.unlink(file_path)
+                except OSError:
                     pass
+            finish_trace(trace, files=len(uploads), progress=job.to_dict()['progress'])
 
-    except Exception as e:
-        print(f"Upload error: {str(e)}")
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+def ingest_document(job, document_id, content_hash, file_path):
+    """Parse, split, embed and save one uploaded PDF's document store. Runs on the ingestion worker pool."""
+    trace = RequestTrace('ingest', request_id=job.id, stage_histogram=stage_duration)
+    with app.app_context():
+        try:
+            set_document_status(document_id, 'processing')
+            job.update(pages_parsed=0, chunks_embedded=0, index_saved=False)
+
+            # The same file may have been indexed since the upload was accepted
+            if not document_store_exists(content_hash):
+                chunk_batches = iter_pdf_chunk_batches(
+                    file_path,
+                    INGESTION_BATCH_SIZE,
+                    on_page=lambda: job.increment('pages_parsed')
+                )
+                # Pages are parsed lazily as batches are embedded, so both count as index_build
+                with trace.stage('index_build'):
+                    document_store_path = build_document_store(
+                        content_hash,
+                        chunk_batches,
+                        on_batch=lambda count: job.increment('chunks_embedded', count)
+                    )
+                with trace.stage('index_save'):
+                    publish_document_store(content_hash, document_store_path)
+            job.update(index_saved=True)
+
+            if not set_document_status(document_id, 'ready'):
+                # The document or its session was deleted while we were indexing
+                release_document_stores([content_hash])
+        except Exception as e:
+            trace.error = str(e)
+            db.session.rollback()
+            set_document_status(document_id, 'failed')
+            raise
+        finally:
+            db.session.remove()
+            try:
+                os.unlink(file_path)
+            except OSError:
+                pass
+            finish_trace(trace, document_id=document_id, progress=job.to_dict()['progress'])
+
+def set_document_status(document_id, status):
+    """Update a Document's status. Returns False if the row no longer exists."""
+    document = db.session.get(Document, document_id)
+    if not document:
+        return False
+    document.status = status
+    db.session.commit()
+    return True
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+@auth_required
+def get_job(job_id):
+    job = ingestion_jobs.get(job_id)
+    if job:
+        session_id, job_data = job.info['session_id'], job.to_dict()
+    else:
+        # Accepted by another worker process
+        record = db.session.get(IngestionJob, job_id)
+        if not record:
+            return jsonify({'error': 'Job not found'}), 404
+        session_id, job_data = record.session_id, record.to_dict()
+
+    session = Session.query.filter_by(id=session_id, user_id=flask_session['user_id']).first()
+    if not session:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify({'job': job_data}), 200
 
 @app.route('/chat', methods=['POST'])
 @auth_required
+@admission_required(chat_limiter)
 def chat():
+    data = request.json
+    user_id = flask_session['user_id']
+    if not CHAT_COALESCING:
+        payload, status = answer_chat(data, user_id)
+        return jsonify(payload), status
+
+    # Double clicks and client retries send the same request again while the first is still running
+    key = json.dumps([
+        user_id, data.get('session_id'), data.get('message'), data.get('mode', 'balanced'),
+        data.get('retrieval', RETRIEVAL_MODE), data.get('pipeline', CHAT_PIPELINE)
+    ], default=str)
+    (payload, status), shared = chat_flights.run(key, lambda: answer_chat(data, user_id))
+    if shared:
+        g.trace.count('coalesced')
+    return jsonify(payload), status
+
+def answer_chat(data, user_id):
+    """Answer a /chat request and store the turn. Returns the response body and status code."""
     try:
-        data = request.json
         message = data['message']
         session_id = data['session_id']
         chat_mode = data.get('mode', 'balanced')
         
         # Get the session
-        session = Session.query.filter_by(id=session_id, user_id=flask_session['user_id']).first()
+        with g.trace.stage('session_load'):
+            session = get_chat_session(session_id, user_id)
         if not session:
-            return jsonify({'error': 'Invalid session'}), 400
+            return {'error': 'Invalid session'}, 400
+
+        # Only documents whose ingestion job finished are in the index
+        if not any(d.status == 'ready' for d in session.documents):
+            if any(d.status in ('pending', 'processing') for d in session.documents):
+                return {'error': 'Documents are still being processed'}, 409
 
         # Count actual conversation pairs
-        chat_count = Chat.query.filter_by(session_id=session_id).count() // 2
+        message_count = get_message_count(session)
+        chat_count = message_count // 2
         
         # Load previous chat history
-        previous_chats = Chat.query.filter_by(session_id=session_id).order_by(Chat.created_at.desc()).limit(CHAT_HISTORY_WINDOW).all()
-        chat_history = []
-        for chat in reversed(previous_chats):
-            chat_history.extend([
-                ("human", chat.message),
-                ("assistant", chat.response)
-            ])
-
-        # Initialize memory with configurable window size
-        memory = ConversationBufferWindowMemory(
-            k=CHAT_HISTORY_WINDOW,
-            memory_key="chat_history",
-            return_messages=True,
-            output_key="answer"
-        )
+        with g.trace.stage('history_load'):
+            previous_chats = get_recent_chats(session, message_count)
+        release_db_connection()
 
-        # Load vectorstore for this session
-        vectorstore_path = f"vectorstores/session_{session_id}"
-        if not os.path.exists(vectorstore_path):
-            return jsonify({'error': 'Session data not found'}), 400
-            
-        vectorstore = FAISS.load_local(
-            vectorstore_path, 
-            embeddings,
-            allow_dangerous_deserialization=True
-        )
-        
-        # Get system message based on mode
-        system_template = CHAT_MODES[chat_mode]
-        system_message_prompt = SystemMessagePromptTemplate.from_template(system_template)
-        
-        # Create human message template
-        human_template = """Document content:
+        if not session_has_index(session):
+            return {'error': 'Session data not found'}, 400
 
-{context}
+        # Lexical and hybrid retrieval are only available in the lean pipeline
+        retrieval_mode = data.get('retrieval', RETRIEVAL_MODE)
+        if retrieval_mode not in RETRIEVAL_MODES:
+            return {'error': f'Unknown retrieval mode: {retrieval_mode}'}, 400
+        pipeline = data.get('pipeline', CHAT_PIPELINE)
+        lean = pipeline == 'lean' or retrieval_mode != 'vector'
 
-Question: {question}
+        # Lexical-only retrieval skips the query embedding call, and with it the answer cache
+        use_answer_cache = ANSWER_CACHE_ENABLED and retrieval_mode != 'lexical'
+        # Both pipelines get the same budgeted history: recent turns after the rolling summary
+        chat_history_text = build_chat_history(session, previous_chats, message_count)
+        cached = None
+        if lean or use_answer_cache:
+            question, query_vector = prepare_question(
+                message, chat_history_text,
+                condense=lean and condenses_follow_ups(pipeline),
+                embed=retrieval_mode != 'lexical'
+            )
+        if use_answer_cache:
+            cache_key = get_answer_cache_key(session, chat_mode, retrieval_mode)
+            with g.trace.stage('answer_cache'):
+                cached = answer_cache.lookup(cache_key, query_vector)
 
-Previous conversation:
-{chat_history}
+        if cached:
+            g.trace.count('answer_cache_hits')
+            answer, sources = cached.answer, cached.sources
+        else:
+            with g.trace.stage('index_load'):
+                session_index = load_session_index(session)
+            if lean:
+                # One retrieval and one generation call, no per-request chain setup
+                with g.trace.stage('retrieval'):
+                    sources = retrieve_sources(
+                        session_index, question, query_vector, retrieval_mode, CONTEXT_TOKEN_BUDGETS[chat_mode]
+                    )
+                prompt = build_lean_prompt(sources, question, chat_history_text, chat_mode)
+                with g.trace.stage('generation'):
+                    answer = get_llm().invoke(prompt)
+                count_llm_tokens(prompt.to_string(), answer)
+            else:
+                # Retrieval and generation both happen inside the chain
+                with g.trace.stage('chain'):
+                    answer, sources = run_conversation_chain(session_index, message, chat_mode, chat_history_text)
+                count_llm_tokens(
+                    CHAT_MODES[chat_mode] + format_documents(sources) + chat_history_text + message, answer
+                )
 
-Provide a direct analysis of the document content."""
-        human_message_prompt = HumanMessagePromptTemplate.from_template(human_template)
-        
-        # Combine prompts
-        chat_prompt = ChatPromptTemplate.from_messages([
-            system_message_prompt,
-            human_message_prompt
-        ])
-        
-        # Create the chain with the chat prompt
-        conversation_chain = ConversationalRetrievalChain.from_llm(
-            llm=llm,
-            retriever=vectorstore.as_retriever(
-                search_kwargs={"k": 4}
-            ),
-            memory=memory,
-            return_source_documents=True,
-            combine_docs_chain_kwargs={
-                "prompt": chat_prompt,
-                "output_key": "answer"
-            }
-        )
-        
-        # Get response using invoke
-        chain_response = conversation_chain.invoke({
-            "question": message,
-            "chat_history": chat_history
-        })
-        
-        # Extract answer from response
-        if not isinstance(chain_response, dict) or 'answer' not in chain_response:
-            raise ValueError("Unexpected response format from conversation chain")
-            
-        answer = chain_response['answer']
-        sources = chain_response.get('source_documents', [])
-
-        # Store chat in database
-        chat = Chat(
-            message=message,
-            response=answer,
-            session_id=session_id,
-            mode=chat_mode
-        )
-        db.session.add(chat)
-        db.session.commit()
+            if use_answer_cache:
+                answer_cache.store(cache_key, question, query_vector, answer, sources)
+
+        # Build the response first: committing expires the session and would reload it
+        result = chat_result(session, chat_mode, chat_count, sources)
+        record_chat(session, message_count, message, answer, chat_mode)
         
-        return jsonify({
+        return {
             'response': answer,
-            'sources': [doc.page_content for doc in sources],
-            'session': {
-                'id': session_id,
-                'name': session.name,
-                'created_at': session.created_at.isoformat(),
-                'documents': [{'id': d.id, 'filename': d.filename} for d in session.documents]
-            },
-            'mode': chat_mode,
-            'chatCount': chat_count,
-            'warningThreshold': CHAT_LENGTH_WARNING,
-            'alertThreshold': CHAT_LENGTH_ALERT
-        }), 200
+            'cached': cached is not None,
+            **result
+        }, 200
         
     except Exception as e:
         print(f"Chat error: {str(e)}")
+        g.trace.error = str(e)
+        db.session.rollback()
+        return {'error': str(e)}, 500
+
+def get_chat_session(session_id, user_id):
+    """Load the user's session together with its documents in a single query."""
+    return Session.query.options(joinedload(Session.documents)).filter_by(id=session_id, user_id=user_id).first()
+
+def get_message_count(session):
+    """The session's message count, including turns still queued for the write-behind queue."""
+    if chat_writer:
+        return chat_writer.message_count(session.id, session.message_count)
+    return session.message_count
+
+def get_recent_chats(session, message_count):
+    """The session's last CHAT_HISTORY_WINDOW turns, newest first, from the history cache when it is current."""
+    chats = chat_history_cache.get(session.id, message_count)
+    if chats is None:
+        if chat_writer:
+            # Queued turns aren't in the table yet
+            chat_writer.wait_for(session.id)
+        rows = Chat.query.filter_by(session_id=session.id).order_by(Chat.created_at.desc()).limit(CHAT_HISTORY_WINDOW).all()
+        chats = chat_history_cache.put(session.id, message_count, rows)
+    return chats
+
+def release_db_connection():
+    """Give the request's pooled database connection back before the slow model calls.
+
+    Everything /chat needs from the session, its documents and history is
+    already loaded and stays readable; record_chat opens a new transaction.
+    Without this every in-flight chat would hold a connection for the whole
+    Gemini round trip, capping concurrency at the pool size.
+    """
+    db.session.close()
+
+def record_chat(session, message_count, message, answer, chat_mode):
+    """Store a chat turn and bump the session's message counter in the same commit.
+
+    ``message_count`` is the session's count before this turn. With
+    CHAT_WRITE_BEHIND the turn is queued and committed in a later batch.
+    """
+    # Read before committing, which expires the session
+    session_id = session.id
+    turn = {
+        'message': message,
+        'response': answer,
+        'session_id': session_id,
+        'mode': chat_mode,
+        # Set now so turns keep their order however they are batched
+        'created_at': datetime.utcnow()
+    }
+    if chat_writer:
+        chat_writer.put(turn, message_count + 1)
+    else:
+        db.session.add(Chat(**turn))
+        # Incremented in SQL so concurrent turns from other workers aren't lost. An explicit
+        # UPDATE also works once /chat/stream's generator has detached the session object.
+        with g.trace.stage('db_commit'):
+            Session.query.filter_by(id=session_id).update(
+                {Session.message_count: Session.message_count + 1},
+                synchronize_session=False
+            )
+            db.session.commit()
+    chat_history_cache.append(session_id, message_count + 1, message, answer)
+
+def build_chat_history(session, previous_chats, message_count):
+    """Format the conversation so far for a prompt, within HISTORY_TOKEN_BUDGET.
+
+    The newest turns are sent as they are, after the session's rolling
+    summary of older ones. When turns stop fitting, a background job folds
+    them into the summary, so they are compressed rather than dropped.
+    """
+    summary = session.history_summary
+    # Turns already folded into the summary aren't repeated
+    unsummarized = previous_chats[:message_count - session.summary_message_count]
+    recent = select_recent_turns(unsummarized, HISTORY_TOKEN_BUDGET - estimate_tokens(summary or ""))
+
+    if message_count - len(recent) > session.summary_message_count:
+        # Leave room for the next few turns so the summary isn't rewritten on every one
+        keep = select_recent_turns(previous_chats, HISTORY_TOKEN_BUDGET // 2)
+        schedule_history_summary(session.id, message_count - len(keep))
+
+    return format_chat_history(reversed(recent), summary)
+
+def schedule_history_summary(session_id, message_count):
+    """Summarize the session's first ``message_count`` chats in the background, unless that is already queued."""
+    with pending_summaries_lock:
+        if session_id in pending_summaries:
+            return
+        pending_summaries.add(session_id)
+    summary_jobs.submit(summarize_session_history, session_id, message_count, session_id=session_id)
+
+def summarize_session_history(job, session_id, message_count):
+    """Fold chats up to ``message_count`` into the session's rolling summary. Runs on the summary worker."""
+    trace = RequestTrace('summarize', request_id=job.id, stage_histogram=stage_duration)
+    with app.app_context():
+        try:
+            session = db.session.get(Session, session_id)
+            if session is None or session.summary_message_count >= message_count:
+                return
+            summarized = session.summary_message_count
+            chats = (
+                Chat.query.filter_by(session_id=session_id)
+                .order_by(Chat.created_at, Chat.id)
+                .offset(summarized)
+                .limit(message_count - summarized)
+                .all()
+            )
+            # Kept to about a quarter of the history budget (~0.75 words per token)
+            with trace.stage('generation'):
+                summary = summarize_chat_history(
+                    get_condense_llm(),
+                    session.history_summary,
+                    format_chat_history(chats),
+                    max_words=HISTORY_TOKEN_BUDGET // 4 * 3 // 4
+                )
+            # Only replace the summary this one was built from; another worker may have moved it on
+            Session.query.filter_by(id=session_id, summary_message_count=summarized).update({
+                Session.history_summary: summary,
+                Session.summary_message_count: summarized + len(chats)
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            trace.error = str(e)
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+            with pending_summaries_lock:
+                pending_summaries.discard(session_id)
+            finish_trace(trace, session_id=session_id)
+
+def condenses_follow_ups(pipeline):
+    """Whether follow-up questions are rewritten as standalone questions before retrieval.
+
+    The chain pipeline always does, as ConversationalRetrievalChain does, also
+    when a request is answered in a single call (streaming, lexical or hybrid
+    retrieval). The lean pipeline only does with CONDENSE_QUESTIONS.
+    """
+    return pipeline == 'chain' or CONDENSE_QUESTIONS
+
+def prepare_question(message, chat_history, condense=False, embed=True):
+    """Optionally condense the question using the formatted ``chat_history``, and embed it.
+
+    Returns the question used for retrieval and its embedding (None when
+    ``embed`` is False, e.g. for lexical-only retrieval).
+    """
+    question = message
+    if condense and chat_history:
+        with g.trace.stage('condense'):
+            question = condense_question(get_condense_llm(), message, chat_history)
+    query_vector = None
+    if embed:
+        with g.trace.stage('query_embedding'):
+            query_vector = get_embeddings().embed_query(question)
+    return question, query_vector
+
+def retrieve_sources(session_index, question, query_vector, retrieval_mode, max_tokens, k=CONTEXT_FETCH_K):
+    """Find the top ``k`` chunks by vector similarity, BM25, or reciprocal rank fusion of both,
+    then merge overlapping ones and keep as many as fit in ``max_tokens``."""
+    if retrieval_mode == 'vector':
+        return assemble_context(session_index.similarity_search_by_vector(query_vector, k=k), max_tokens)
+
+    if retrieval_mode == 'lexical':
+        ids = [chunk_id for chunk_id, _ in session_index.lexical_search(question, k=k)]
+    else:
+        lexical_ids = [chunk_id for chunk_id, _ in session_index.lexical_search(question, k=HYBRID_FETCH_K)]
+        vector_ids = [doc.id for doc in session_index.similarity_search_by_vector(query_vector, k=HYBRID_FETCH_K)]
+        ids = reciprocal_rank_fusion([vector_ids, lexical_ids])[:k]
+
+    return assemble_context(session_index.get_chunks(ids), max_tokens)
+
+def build_lean_prompt(sources, question, chat_history, chat_mode):
+    """Fill the precompiled prompt for a single generation call."""
+    return CHAT_PROMPTS[chat_mode].format_prompt(
+        context=format_documents(sources),
+        question=question,
+        chat_history=chat_history
+    )
+
+def get_answer_cache_key(session, chat_mode, retrieval_mode):
+    """Answers are only reused for the same set of indexed documents, chat mode and retrieval mode."""
+    document_version = tuple(sorted(d.id for d in session.documents if d.status == 'ready'))
+    return (session.id, document_version, chat_mode, retrieval_mode)
+
+def import_chain_classes():
+    """Imported on first use, so workers that only ingest or take the lean pipeline skip it."""
+    from langchain.chains import ConversationalRetrievalChain
+    return ConversationalRetrievalChain
+
+def run_conversation_chain(session_index, message, chat_mode, chat_history):
+    """Answer with ConversationalRetrievalChain. Returns the answer and source documents.
+
+    ``chat_history`` is the text from ``build_chat_history``, used as is in
+    both the condense and the answer prompt, so the chain keeps to
+    HISTORY_TOKEN_BUDGET like the lean pipeline.
+    """
+    ConversationalRetrievalChain = import_chain_classes()
+
+    # Create the chain with the chat prompt
+    conversation_chain = ConversationalRetrievalChain.from_llm(
+        llm=get_llm(),
+        retriever=session_index.as_retriever(get_embeddings(), k=CONTEXT_FETCH_K, max_tokens=CONTEXT_TOKEN_BUDGETS[chat_mode]),
+        get_chat_history=lambda _: chat_history,
+        return_source_documents=True,
+        combine_docs_chain_kwargs={
+            "prompt": CHAT_PROMPTS[chat_mode],
+            "output_key": "answer"
+        }
+    )
+
+    # Get response using invoke
+    chain_response = conversation_chain.invoke({
+        "question": message,
+        # Formatted by get_chat_history above
+        "chat_history": []
+    })
+
+    # Extract answer from response
+    if not isinstance(chain_response, dict) or 'answer' not in chain_response:
+        raise ValueError("Unexpected response format from conversation chain")
+
+    return chain_response['answer'], chain_response.get('source_documents', [])
+
+def chat_result(session, chat_mode, chat_count, sources):
+    """Fields shared by the /chat response and the final /chat/stream event."""
+    return {
+        'sources': [doc.page_content for doc in sources],
+        'session': {
+            'id': session.id,
+            'name': session.name,
+            'created_at': session.created_at.isoformat(),
+            'documents': [{'id': d.id, 'filename': d.filename, 'status': d.status} for d in session.documents]
+        },
+        'mode': chat_mode,
+        'chatCount': chat_count,
+        'warningThreshold': CHAT_LENGTH_WARNING,
+        'alertThreshold': CHAT_LENGTH_ALERT
+    }
+
+@app.route('/chat/stream', methods=['POST'])
+@auth_required
+@admission_required(chat_limiter)
+def chat_stream():
+    """Like /chat, but sends answer tokens as Server-Sent Events while Gemini generates them.
+
+    Answers are always generated in one streamed call, like the lean
+    pipeline; with the chain pipeline (the default) follow-up questions are
+    still condensed before retrieval, as /chat's chain does.
+
+    Emits ``token`` events with ``{"text": ...}``, then one ``done`` event with
+    the sources and chatCount, or an ``error`` event if generation fails.
+    The Chat row is stored once the stream finishes.
+    """
+    try:
+        data = request.json
+        message = data['message']
+        session_id = data['session_id']
+        chat_mode = data.get('mode', 'balanced')
+
+        with g.trace.stage('session_load'):
+            session = get_chat_session(session_id, flask_session['user_id'])
+        if not session:
+            return jsonify({'error': 'Invalid session'}), 400
+
+        if not any(d.status == 'ready' for d in session.documents):
+            if any(d.status in ('pending', 'processing') for d in session.documents):
+                return jsonify({'error': 'Documents are still being processed'}), 409
+
+        if not session_has_index(session):
+            return jsonify({'error': 'Session data not found'}), 400
+
+        message_count = get_message_count(session)
+        chat_count = message_count // 2
+        with g.trace.stage('history_load'):
+            previous_chats = get_recent_chats(session, message_count)
+        release_db_connection()
+
+        retrieval_mode = data.get('retrieval', RETRIEVAL_MODE)
+        if retrieval_mode not in RETRIEVAL_MODES:
+            return jsonify({'error': f'Unknown retrieval mode: {retrieval_mode}'}), 400
+
+        use_answer_cache = ANSWER_CACHE_ENABLED and retrieval_mode != 'lexical'
+        chat_history_text = build_chat_history(session, previous_chats, message_count)
+        question, query_vector = prepare_question(
+            message, chat_history_text,
+            condense=condenses_follow_ups(data.get('pipeline', CHAT_PIPELINE)),
+            embed=retrieval_mode != 'lexical'
+        )
+        cached = None
+        if use_answer_cache:
+            cache_key = get_answer_cache_key(session, chat_mode, retrieval_mode)
+            with g.trace.stage('answer_cache'):
+                cached = answer_cache.lookup(cache_key, query_vector)
+
+        if cached:
+            g.trace.count('answer_cache_hits')
+            sources = cached.sources
+        else:
+            # Retrieve before streaming so lookup errors still return a normal JSON error
+            with g.trace.stage('index_load'):
+                session_index = load_session_index(session)
+            with g.trace.stage('retrieval'):
+                sources = retrieve_sources(
+                    session_index, question, query_vector, retrieval_mode, CONTEXT_TOKEN_BUDGETS[chat_mode]
+                )
+            prompt = build_lean_prompt(sources, question, chat_history_text, chat_mode)
+    except Exception as e:
+        print(f"Chat stream error: {str(e)}")
+        g.trace.error = str(e)
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+    def generate():
+        try:
+            if cached:
+                answer = cached.answer
+                yield sse_event('token', {'text': answer})
+            else:
+                parts = []
+                started = time.perf_counter()
+                for token in get_llm().stream(prompt):
+                    if not parts:
+                        g.trace.record('first_token', time.perf_counter() - started)
+                    parts.append(token)
+                    yield sse_event('token', {'text': token})
+                g.trace.record('generation', time.perf_counter() - started)
+                answer = "".join(parts)
+                count_llm_tokens(prompt.to_string(), answer)
+                if use_answer_cache:
+                    answer_cache.store(cache_key, question, query_vector, answer, sources)
+
+            result = chat_result(session, chat_mode, chat_count, sources)
+            record_chat(session, message_count, message, answer, chat_mode)
+
+            yield sse_event('done', {
+                'cached': cached is not None,
+                **result
+            })
+        except Exception as e:
+            print(f"Chat stream error: {str(e)}")
+            g.trace.error = str(e)
+            db.session.rollback()
+            yield sse_event('error', {'error': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop reverse proxies from buffering the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/check-user/<email>', methods=['GET'])
 def check_user(email):
     user = User.query.filter_by(email=email).first()
@@ -386,6 +1619,22 @@ def test_db():
             'message': str(e)
         }), 500
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 503 until warm_up() has finished in this worker."""
+    if not app_ready.is_set():
+        return jsonify({'ready': False}), 503
+    return jsonify({'ready': True}), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, stage, token, error and cache metrics in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({name: cache.stats() for name, cache in CACHES.items()}), 200
+
 @app.route('/sessions/<int:session_id>/documents', methods=['GET'])
 @auth_required
 def get_session_documents(session_id):
@@ -399,12 +1648,43 @@ def get_session_documents(session_id):
             'documents': [{
                 'id': doc.id,
                 'filename': doc.filename,
-                'uploaded_at': doc.uploaded_at.isoformat()
+                'uploaded_at': doc.uploaded_at.isoformat(),
+                'status': doc.status
             } for doc in documents]
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/sessions/<int:session_id>/documents/<int:document_id>', methods=['DELETE'])
+@auth_required
+def delete_session_document(session_id, document_id):
+    try:
+        session = Session.query.filter_by(id=session_id, user_id=flask_session['user_id']).first()
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
+
+        document = Document.query.filter_by(id=document_id, session_id=session_id).first()
+        if not document:
+            return jsonify({'error': 'Document not found'}), 404
+
+        if not document.content_hash:
+            removed = remove_document_chunks(session_id, document_id)
+            print(f"Removed {removed} vectors for document {document_id} from session {session_id}")
+
+        db.session.delete(document)
+        db.session.commit()
+        answer_cache.invalidate_session(session_id)
+        # Other sessions may still reference the same content
+        release_document_stores([document.content_hash])
+
+        return jsonify({
+            'success': True,
+            'message': 'Document deleted successfully'
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/sessions/<int:session_id>', methods=['PATCH'])
 @auth_required
 def update_session(session_id):
@@ -436,6 +1716,9 @@ def update_session(session_id):
 def delete_session(session_id):
     try:
         print(f"Attempting to delete session {session_id}")
+        if chat_writer:
+            # Otherwise queued turns would be written after the session is gone
+            chat_writer.wait_for(session_id)
         session = Session.query.filter_by(id=session_id, user_id=flask_session['user_id']).first()
         
         if not session:
@@ -443,7 +1726,11 @@ def delete_session(session_id):
             return jsonify({'error': 'Session not found'}), 404
             
         # Delete associated files
-        vectorstore_path = f"vectorstores/session_{session_id}"
+        vectorstore_cache.invalidate(session_id)
+        lexical_index_cache.invalidate(session_id)
+        answer_cache.invalidate_session(session_id)
+        chat_history_cache.invalidate(session_id)
+        vectorstore_path = get_vectorstore_path(session_id)
         if os.path.exists(vectorstore_path):
             try:
                 print(f"Deleting vectorstore at {vectorstore_path}")
@@ -455,8 +1742,10 @@ def delete_session(session_id):
         
         # Delete the session (this will cascade to documents and chats)
         print("Deleting session from database")
+        content_hashes = [d.content_hash for d in session.documents]
         db.session.delete(session)
         db.session.commit()
+        release_document_stores(content_hashes)
         print("Session deleted successfully")
             
         return jsonify({
@@ -473,6 +1762,9 @@ def delete_session(session_id):
 @auth_required
 def get_session_messages(session_id):
     try:
+        if chat_writer:
+            # Include turns that were answered but not yet committed
+            chat_writer.wait_for(session_id)
         # Verify session belongs to user
         session = Session.query.filter_by(
             id=session_id, 
@@ -481,49 +1773,100 @@ def get_session_messages(session_id):
         if not session:
             return jsonify({'error': 'Session not found'}), 404
 
-        # Get messages for session
-        messages = Chat.query.filter_by(session_id=session_id).order_by(Chat.created_at).all()
-        
+        # Page backwards from the newest message; the client prepends older pages
+        limit = get_page_size(request.args.get('limit'), MESSAGES_PAGE_SIZE, MAX_PAGE_SIZE)
+        chats, next_cursor = paginate_newest_first(
+            Chat.query.filter_by(session_id=session_id), Chat, limit, request.args.get('cursor')
+        )
+
+        messages = []
+        for chat in reversed(chats):
+            messages.append({'isUser': True, 'text': chat.message, 'mode': chat.mode})
+            messages.append({'isUser': False, 'text': chat.response, 'mode': chat.mode})
+
         return jsonify({
-            'messages': [{
-                'isUser': True,
-                'text': chat.message,
-                'mode': chat.mode
-            } if i % 2 == 0 else {
-                'isUser': False,
-                'text': chat.response,
-                'mode': chat.mode
-            } for i, chat in enumerate(messages)],
-            'chatCount': len(messages) // 2  # Count conversation pairs
+            'messages': messages,
+            'next_cursor': next_cursor,
+            'chatCount': session.message_count // 2  # Count conversation pairs
         }), 200
-        
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error fetching session messages: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def warm_up():
+    """Get a worker ready to serve; used by both the dev server and wsgi.py.
+
+    With PREWARM_SESSIONS set, this creates the model clients and loads the
+    indexes of the sessions with the most recent chats into the caches, so
+    the first chats after a restart don't pay for imports and index loads.
+    /ready reports ready once it returns.
+    """
+    if PREWARM_SESSIONS > 0:
+        started = time.perf_counter()
+        get_llm()
+        get_condense_llm()
+        get_embeddings()
+        if CHAT_PIPELINE == 'chain':
+            import_chain_classes()
+
+        with app.app_context():
+            recent = (
+                db.session.query(Chat.session_id)
+                .group_by(Chat.session_id)
+                .order_by(db.func.max(Chat.created_at).desc())
+                .limit(PREWARM_SESSIONS)
+                .all()
+            )
+            sessions = Session.query.options(joinedload(Session.documents)).filter(
+                Session.id.in_([session_id for session_id, in recent])
+            ).all()
+            for session in sessions:
+                try:
+                    load_session_index(session)
+                except Exception as e:
+                    print(f"Error prewarming session {session.id}: {str(e)}")
+            db.session.remove()
+        print(f"Prewarmed {len(sessions)} sessions in {time.perf_counter() - started:.2f}s")
+    app_ready.set()
+
+def init_database(create_test_user=False):
+    """Create missing tables, columns and indexes; used by both the dev server and wsgi.py."""
+    # Create all tables
+    db.create_all()
+    upgrade_schema()
+    print("Database tables created successfully")
+
+    if not create_test_user:
+        return
+
+    # Check if we have any users
+    user_count = User.query.count()
+    print(f"Current user count: {user_count}")
+
+    # Create a test user if no users exist
+    if user_count == 0:
+        test_user = User(
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        test_user.set_password("test123")
+        db.session.add(test_user)
+        db.session.commit()
+        print("Created test user with email: test@example.com")
+
 if __name__ == '__main__':
+    # Development server; see wsgi.py and gunicorn.conf.py for production
     with app.app_context():
         try:
-            # Create all tables
-            db.create_all()
-            print("Database tables created successfully")
-            
-            # Check if we have any users
-            user_count = User.query.count()
-            print(f"Current user count: {user_count}")
-            
-            # Create a test user if no users exist
-            if user_count == 0:
-                test_user = User(
-                    email="test@example.com",
-                    first_name="Test",
-                    last_name="User"
-                )
-                test_user.set_password("test123")
-                db.session.add(test_user)
-                db.session.commit()
-                print("Created test user with email: test@example.com")
+            init_database(create_test_user=True)
         except Exception as e:
             print("Database initialization error:", str(e))
+    # Nothing else is building document stores before the development server starts
+    remove_interrupted_builds(max_age_seconds=0)
+    warm_up()
     
     app.run(debug=True, port=5000) 
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""Count the SQL statements each /chat turn runs, and fail if it goes over budget.
+
+Uses a throwaway database, fake embeddings and a fake LLM, so it runs
+offline. Run from the backend directory:
+
+    python benchmarks/chat_queries.py --turns 20 --max-queries 3
+
+Exits with status 1 if any turn after the first (which fills the history
+cache) runs more than ``--max-queries`` statements. tests/test_chat_queries.py
+checks the same budget with these helpers.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document as LangchainDocument
+from langchain_core.language_models.fake import FakeListLLM
+from sqlalchemy import event
+
+# Statements a /chat turn may run once the session's history is cached
+MAX_QUERIES_PER_TURN = 3
+FAKE_ENVIRONMENT = {
+    "EMBEDDING_BACKEND": "fake",
+    "REQUEST_LOGS": "false",
+    "CHAT_WRITE_BEHIND": "false",
+    "GOOGLE_API_KEY": "unused"
+}
+EMAIL = "queries@example.com"
+PASSWORD = "queries"
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        # History summaries are written by a background worker, outside the request
+        if threading.current_thread() is threading.main_thread():
+            self.statements.append(statement.split()[0].upper())
+
+
+@contextmanager
+def count_queries(chat_app):
+    """Record the statements the main thread runs on the app's database inside the block."""
+    counter = QueryCounter()
+    with chat_app.app.app_context():
+        engine = chat_app.db.engine
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+def load_app(work_dir):
+    """Import the app with fake embeddings and a fake LLM, keeping its database and indexes in ``work_dir``."""
+    os.environ.update(FAKE_ENVIRONMENT)
+    os.chdir(work_dir)
+
+    # Keep the SQLite database and embedding cache out of backend/instance
+    from flask import Flask
+    Flask.auto_find_instance_path = lambda self: work_dir
+
+    import app as chat_app
+    chat_app.llm = FakeListLLM(responses=["A fixed answer."])
+    chat_app.condense_llm = FakeListLLM(responses=["A fixed summary."])
+    return chat_app
+
+
+def setup_session(chat_app):
+    """Create a user and a session with one ready, indexed document. Returns a logged-in client and the session id."""
+    from models import db, User, Session, Document
+
+    content_hash = "0" * 64
+    chunks = [
+        LangchainDocument(page_content=f"Section {i}: the retention period for record type {i} is {i + 1} years.")
+        for i in range(50)
+    ]
+    chat_app.publish_document_store(content_hash, chat_app.build_document_store(content_hash, [chunks]))
+
+    with chat_app.app.app_context():
+        db.create_all()
+        user = User(first_name="Query", last_name="Counter", email=EMAIL)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.flush()
+        session = Session(user_id=user.id)
+        db.session.add(session)
+        db.session.flush()
+        db.session.add(Document(filename="queries.pdf", session_id=session.id, status="ready", content_hash=content_hash))
+        db.session.commit()
+        session_id = session.id
+
+    client = chat_app.app.test_client()
+    client.post("/login", json={"email": EMAIL, "password": PASSWORD})
+    return client, session_id
+
+
+def chat_turn_queries(chat_app, client, session_id, pipeline, turn):
+    """Send one /chat turn and return the statements it ran."""
+    with count_queries(chat_app) as counter:
+        response = client.post("/chat", json={
+            "message": f"{pipeline} question {turn} about retention periods",
+            "session_id": session_id,
+            "pipeline": pipeline
+        })
+    assert response.status_code == 200, response.json
+    return counter.statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--max-queries", type=int, default=MAX_QUERIES_PER_TURN)
+    args = parser.parse_args()
+
+    chat_app = load_app(tempfile.mkdtemp(prefix="chat-queries-"))
+    client, session_id = setup_session(chat_app)
+
+    failed = False
+    for pipeline in ("chain", "lean"):
+        for turn in range(args.turns):
+            statements = chat_turn_queries(chat_app, client, session_id, pipeline, turn)
+            if turn == 0:
+                print(f"{pipeline:5} first turn: {len(statements)} queries ({', '.join(statements)})")
+            elif len(statements) > args.max_queries:
+                failed = True
+                print(f"{pipeline:5} turn {turn}: {len(statements)} queries over budget ({', '.join(statements)})")
+        print(f"{pipeline:5} steady state: {len(statements)} queries per turn ({', '.join(statements)})")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measure embedding scheduler throughput offline against the fake backend.
+
+Run from the backend directory:
+
+    python benchmarks/embedding_throughput.py --texts 2000 --latency-ms 150
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_scheduler import ScheduledEmbeddings
+from fake_backends import FakeEmbeddings
+
+
+def run(texts, batch_size, max_in_flight, requests_per_minute, latency_ms, error_rate):
+    backend = FakeEmbeddings(latency_seconds=latency_ms / 1000, error_rate=error_rate)
+    scheduler = ScheduledEmbeddings(
+        backend,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        requests_per_minute=requests_per_minute,
+        max_retries=10
+    )
+    payload = [f"chunk {i} " * 50 for i in range(texts)]
+
+    start = time.perf_counter()
+    vectors = scheduler.embed_documents(payload)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == texts
+
+    return {
+        'batch_size': batch_size,
+        'max_in_flight': max_in_flight,
+        'seconds': elapsed,
+        'texts_per_second': texts / elapsed,
+        'requests': scheduler.requests,
+        'retries': scheduler.retries
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--texts', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=int, default=150, help='fake latency per request')
+    parser.add_argument('--requests-per-minute', type=int, default=0, help='0 disables rate limiting')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failing with 429')
+    parser.add_argument('--batch-sizes', default='25,50,100')
+    parser.add_argument('--in-flight', default='1,2,4,8')
+    args = parser.parse_args()
+
+    print(f"{'batch':>6} {'in_flight':>9} {'seconds':>8} {'texts/s':>9} {'requests':>8} {'retries':>7}")
+    for batch_size in (int(b) for b in args.batch_sizes.split(',')):
+        for max_in_flight in (int(n) for n in args.in_flight.split(',')):
+            result = run(args.texts, batch_size, max_in_flight, args.requests_per_minute or None,
+                         args.latency_ms, args.error_rate)
+            print(f"{result['batch_size']:>6} {result['max_in_flight']:>9} {result['seconds']:>8.2f} "
+                  f"{result['texts_per_second']:>9.0f} {result['requests']:>8} {result['retries']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""End-to-end benchmark of /upload and /chat with fake Gemini backends.
+
+Swaps the LLM and embeddings for the deterministic fakes in fake_backends
+(with configurable latency), writes synthetic PDFs, and drives the app
+through the Flask test client from several threads at once. Reports
+ingestion pages/sec, chat and stream latency percentiles, throughput and
+peak RSS. Everything runs in a throwaway directory; nothing touches the
+network. Run from the backend directory:
+
+    python benchmarks/service_load.py --pages 10,50,200 --requests 200 --concurrency 8
+
+Save a run with ``--save baseline.json`` and check later runs against it
+with ``--baseline baseline.json``; the script exits with status 1 if any
+metric is more than ``--tolerance`` worse than the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_pdfs import write_pdf
+
+# Metrics compared against a baseline, and whether a higher value is better
+TRACKED_METRICS = {
+    ('ingestion', 'pages_per_second'): True,
+    ('chat', 'p50_ms'): False,
+    ('chat', 'p95_ms'): False,
+    ('chat', 'p99_ms'): False,
+    ('chat', 'requests_per_second'): True,
+    ('stream', 'ttft_p95_ms'): False,
+    ('stream', 'p95_ms'): False,
+    ('memory', 'peak_rss_mb'): False
+}
+
+
+def load_app(args, work_dir):
+    """Import the app configured for fake backends, with its data under ``work_dir``."""
+    os.environ.update({
+        'EMBEDDING_BACKEND': 'fake',
+        'FAKE_EMBEDDING_LATENCY_MS': str(args.embedding_latency_ms),
+        'LLM_BACKEND': 'fake',
+        'FAKE_LLM_LATENCY_MS': str(args.llm_latency_ms),
+        'FAKE_LLM_TOKEN_LATENCY_MS': str(args.token_latency_ms),
+        'CHAT_PIPELINE': args.pipeline,
+        'REQUEST_LOGS': 'false'
+    })
+    os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+    os.chdir(work_dir)
+
+    # Keep the SQLite databases out of backend/instance
+    from flask import Flask
+    Flask.auto_find_instance_path = lambda self: work_dir
+
+    import app as chat_app
+    with chat_app.app.app_context():
+        chat_app.db.create_all()
+    return chat_app
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children (the PDF parsing pool)."""
+    usage = sum(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return usage / (1024 * 1024 if platform.system() == 'Darwin' else 1024)
+
+
+def percentiles(values, prefix=''):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) if values else (0.0, 0.0, 0.0)
+    return {f'{prefix}p50_ms': round(p50, 1), f'{prefix}p95_ms': round(p95, 1), f'{prefix}p99_ms': round(p99, 1)}
+
+
+def login(chat_app, index):
+    client = chat_app.app.test_client()
+    email = f'bench{index}@example.com'
+    client.post('/register', json={'firstName': 'Bench', 'lastName': str(index), 'email': email, 'password': 'bench'})
+    response = client.post('/login', json={'email': email, 'password': 'bench'})
+    assert response.status_code == 200, response.json
+    return client
+
+
+def upload(client, path, session_id=None):
+    """Upload a PDF and wait for it to be indexed. Returns (session id, seconds until ready)."""
+    started = time.perf_counter()
+    data = {'file': (open(path, 'rb'), os.path.basename(path))}
+    if session_id:
+        data['session_id'] = str(session_id)
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+    assert response.status_code in (201, 202), response.json
+    job_id = response.json['job_id']
+    while job_id:
+        job = client.get(f'/jobs/{job_id}').json['job']
+        if job['status'] == 'failed':
+            raise RuntimeError(f"Ingestion failed: {job['error']}")
+        if job['status'] == 'completed':
+            break
+        time.sleep(0.01)
+    return response.json['session_id'], time.perf_counter() - started
+
+
+def run_ingestion(client, page_counts, work_dir):
+    files = []
+    for i, page_count in enumerate(page_counts):
+        # Distinct text per file, so neither the document stores nor the embedding cache are reused
+        path = write_pdf(os.path.join(work_dir, f'ingest_{page_count}p.pdf'), page_count, seed=1000 + i)
+        _, seconds = upload(client, path)
+        files.append({'pages': page_count, 'seconds': round(seconds, 3), 'pages_per_second': round(page_count / seconds, 1)})
+        print(f"  {page_count:>5} pages in {seconds:6.2f}s  {page_count / seconds:8.1f} pages/s")
+
+    total_pages = sum(f['pages'] for f in files)
+    total_seconds = sum(f['seconds'] for f in files)
+    return {'files': files, 'pages_per_second': round(total_pages / total_seconds, 1)}
+
+
+def chat_request(client, session_id, endpoint, message):
+    """Send one chat request. Returns (seconds, seconds to first token or None, succeeded)."""
+    body = {'message': message, 'session_id': session_id}
+    started = time.perf_counter()
+    if endpoint == 'chat':
+        response = client.post('/chat', json=body)
+        return time.perf_counter() - started, None, response.status_code == 200
+
+    response = client.post('/chat/stream', json=body, buffered=False)
+    first_token = None
+    failed = response.status_code != 200
+    for chunk in response.response:
+        if first_token is None and b'event: token' in chunk:
+            first_token = time.perf_counter() - started
+        failed = failed or b'event: error' in chunk
+    response.close()
+    return time.perf_counter() - started, first_token, not failed
+
+
+def run_chat_load(workers, endpoint, requests, concurrency):
+    """Spread ``requests`` chat turns over ``concurrency`` threads, each a different user."""
+    latencies, first_tokens = [], []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(index):
+        nonlocal errors
+        client, session_id = workers[index]
+        for turn in range(index, requests, concurrency):
+            # Every question is different, so the answer cache never serves them
+            seconds, first_token, ok = chat_request(
+                client, session_id, endpoint, f"What is the retention period for reference {turn} ({endpoint})?"
+            )
+            with lock:
+                latencies.append(seconds * 1000)
+                if first_token is not None:
+                    first_tokens.append(first_token * 1000)
+                errors += not ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'requests_per_second': round(requests / elapsed, 1),
+        **percentiles(latencies)
+    }
+    if endpoint == 'stream':
+        result.update(percentiles(first_tokens, prefix='ttft_'))
+    return result
+
+
+def compare(results, baseline, tolerance, tracked_metrics=TRACKED_METRICS):
+    """Return descriptions of tracked metrics that are more than ``tolerance`` worse than ``baseline``."""
+    regressions = []
+    for (section, metric), higher_is_better in tracked_metrics.items():
+        current = results.get(section, {}).get(metric)
+        previous = baseline.get(section, {}).get(metric)
+        if not current or not previous:
+            continue
+        change = (current - previous) / previous
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{section}.{metric}: {previous} -> {current} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', default='10,50,200', help='page counts of the PDFs to ingest')
+    parser.add_argument('--chat-pages', type=int, default=50, help='page count of the PDF chatted with')
+    parser.add_argument('--requests', type=int, default=200, help='chat requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--pipeline', choices=('chain', 'lean'), default='chain')
+    parser.add_argument('--embedding-latency-ms', type=int, default=50, help='fake latency per embedding request')
+    parser.add_argument('--llm-latency-ms', type=int, default=300, help='fake latency before the first token')
+    parser.add_argument('--token-latency-ms', type=int, default=5, help='fake latency per further token')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against results saved earlier with --save')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression, e.g. 0.2 for 20%%')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='service-load-')
+    save_path = os.path.abspath(args.save) if args.save else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    chat_app = load_app(args, work_dir)
+
+    print("Ingestion")
+    ingestion = run_ingestion(login(chat_app, 0), [int(p) for p in args.pages.split(',')], work_dir)
+
+    # Each worker is its own user with a session over the same document; after
+    # the first upload the rest reuse its document store
+    chat_pdf = write_pdf(os.path.join(work_dir, 'chat.pdf'), args.chat_pages, seed=1)
+    workers = []
+    for index in range(1, args.concurrency + 1):
+        client = login(chat_app, index)
+        session_id, _ = upload(client, chat_pdf)
+        # Warm up, so the first index load isn't counted in the percentiles
+        chat_request(client, session_id, 'chat', 'warm up')
+        workers.append((client, session_id))
+
+    results = {'config': vars(args), 'ingestion': ingestion}
+    for endpoint in ('chat', 'stream'):
+        result = run_chat_load(workers, endpoint, args.requests, args.concurrency)
+        results[endpoint] = result
+        print(f"{endpoint.capitalize()}: {result['requests_per_second']} req/s, p50 {result['p50_ms']} ms, "
+              f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, {result['errors']} errors"
+              + (f", first token p95 {result['ttft_p95_ms']} ms" if endpoint == 'stream' else ''))
+
+    results['memory'] = {'peak_rss_mb': round(peak_rss_mb(), 1)}
+    print(f"Peak RSS: {results['memory']['peak_rss_mb']} MB")
+
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {save_path}")
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
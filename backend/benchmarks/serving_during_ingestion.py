@@ -0,0 +1,148 @@
+"""Check that a Gunicorn worker keeps answering requests while it ingests a PDF.
+
+Starts Gunicorn with gunicorn.conf.py and one worker, uploads a synthetic
+PDF, and polls ``GET /ready`` every ``--interval-ms`` until the ingestion
+job finishes. Reports how many probes completed and the slowest one. Uses
+the fake Gemini backends and a throwaway directory, so nothing touches the
+network. Run from the backend directory:
+
+    python benchmarks/serving_during_ingestion.py --pages 1500 --max-probe-ms 1000
+
+Exits with status 1 if any probe took longer than ``--max-probe-ms``.
+Set GUNICORN_WORKER_CLASS to compare worker classes.
+tests/test_serving_during_ingestion.py checks the same thing with these helpers.
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from synthetic_pdfs import write_pdf
+
+EMAIL = "ingest@example.com"
+PASSWORD = "ingest"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def run_gunicorn(work_dir, startup_timeout=60, **env):
+    """Serve the app from ``work_dir`` with one Gunicorn worker and yield its base URL."""
+    port = free_port()
+    env = {
+        **os.environ,
+        "EMBEDDING_BACKEND": "fake",
+        "LLM_BACKEND": "fake",
+        "REQUEST_LOGS": "false",
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "unused"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(work_dir, 'chat_app.db')}",
+        "EMBEDDING_CACHE_PATH": os.path.join(work_dir, "embedding_cache.db"),
+        "WEB_CONCURRENCY": "1",
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+        **env
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--pythonpath", BACKEND_DIR,
+         "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"), "wsgi:app"],
+        cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Gunicorn exited with status {process.returncode}")
+            try:
+                if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                    break
+            except (requests.ConnectionError, requests.Timeout):
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Gunicorn did not become ready in time")
+            time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def login(base_url):
+    client = requests.Session()
+    client.post(f"{base_url}/register", json={
+        "firstName": "Ingest", "lastName": "Probe", "email": EMAIL, "password": PASSWORD
+    })
+    response = client.post(f"{base_url}/login", json={"email": EMAIL, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return client
+
+
+def probe_during_ingestion(base_url, client, pdf_path, interval=0.02, timeout=600):
+    """Upload ``pdf_path`` and time ``GET /ready`` probes until its job finishes.
+
+    Returns the probe latencies in milliseconds and the ingestion time in seconds.
+    """
+    started = time.perf_counter()
+    with open(pdf_path, "rb") as f:
+        response = client.post(f"{base_url}/upload", files={"file": (os.path.basename(pdf_path), f)})
+    assert response.status_code in (201, 202), response.text
+    job_id = response.json()["job_id"]
+
+    probe = requests.Session()
+    latencies = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        probe_started = time.perf_counter()
+        assert probe.get(f"{base_url}/ready", timeout=timeout).status_code == 200
+        latencies.append((time.perf_counter() - probe_started) * 1000)
+
+        job = client.get(f"{base_url}/jobs/{job_id}", timeout=timeout).json()["job"]
+        if job["status"] == "failed":
+            raise RuntimeError(f"Ingestion failed: {job['error']}")
+        if job["status"] == "completed":
+            return latencies, time.perf_counter() - started
+        time.sleep(interval)
+    raise RuntimeError("Ingestion did not finish in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1500)
+    parser.add_argument("--interval-ms", type=float, default=20)
+    parser.add_argument("--max-probe-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="serving-during-ingestion-")
+    try:
+        pdf_path = write_pdf(os.path.join(work_dir, f"ingest_{args.pages}p.pdf"), args.pages, seed=1)
+        with run_gunicorn(work_dir) as base_url:
+            latencies, seconds = probe_during_ingestion(base_url, login(base_url), pdf_path, args.interval_ms / 1000)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    worst = max(latencies)
+    print(f"worker class: {os.getenv('GUNICORN_WORKER_CLASS', 'default')}")
+    print(f"{args.pages} pages ingested in {seconds:.2f}s")
+    print(f"{len(latencies)} /ready probes, worst {worst:.0f} ms, mean {sum(latencies) / len(latencies):.0f} ms")
+    sys.exit(1 if worst > args.max_probe_ms else 0)
+
+
+if __name__ == "__main__":
+    main()
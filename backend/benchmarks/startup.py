@@ -0,0 +1,155 @@
+"""Benchmark of worker startup: app import time and first-request latency.
+
+Each measurement runs in a fresh Python process, so nothing is already
+imported or cached. Reports the time to import and set up the app, and the
+latency of a process's first and second /chat requests, both cold and after
+warm_up() has prewarmed the session (PREWARM_SESSIONS). Uses the fake
+Gemini backends from fake_backends, so nothing touches the network. Run
+from the backend directory:
+
+    python benchmarks/startup.py --runs 5
+
+``--save`` and ``--baseline`` work as in service_load.py.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service_load import chat_request, compare, load_app, login, upload
+from synthetic_pdfs import write_pdf
+
+# Metrics compared against a baseline, and whether a higher value is better
+TRACKED_METRICS = {
+    ('import', 'seconds'): False,
+    ('cold', 'first_chat_ms'): False,
+    ('prewarmed', 'first_chat_ms'): False
+}
+
+
+def child_setup(args):
+    """Create the user and an indexed session that the measured processes chat with."""
+    chat_app = load_app(args, args.work_dir)
+    client = login(chat_app, 0)
+    session_id, _ = upload(client, write_pdf(os.path.join(args.work_dir, 'startup.pdf'), args.pages, seed=1))
+    chat_request(client, session_id, 'chat', 'First question')
+    return {'session_id': session_id}
+
+
+def child_measure(args):
+    started = time.perf_counter()
+    chat_app = load_app(args, args.work_dir)
+    result = {
+        'import_seconds': time.perf_counter() - started,
+        'google_clients_imported': 'langchain_google_genai' in sys.modules
+    }
+
+    started = time.perf_counter()
+    chat_app.warm_up()
+    result['warm_up_seconds'] = time.perf_counter() - started
+
+    client = login(chat_app, 0)
+    for name, message in (('first_chat_ms', 'What is the retention period?'), ('second_chat_ms', 'Who approves it?')):
+        seconds, _, ok = chat_request(client, args.session_id, 'chat', message)
+        assert ok, f"{name} failed"
+        result[name] = seconds * 1000
+    return result
+
+
+def run_child(mode, args, **env):
+    """Run this script in a new process in ``mode`` and return the JSON it prints."""
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', mode, '--work-dir', args.work_dir,
+        '--pages', str(args.pages), '--pipeline', args.pipeline,
+        '--embedding-latency-ms', str(args.embedding_latency_ms),
+        '--llm-latency-ms', str(args.llm_latency_ms),
+        '--token-latency-ms', str(args.token_latency_ms)
+    ]
+    if args.session_id is not None:
+        command += ['--session-id', str(args.session_id)]
+    completed = subprocess.run(
+        command, env={**os.environ, **env}, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs, fields):
+    """Median of each field over the runs."""
+    return {field: round(float(np.median([run[field] for run in runs])), 3 if field.endswith('seconds') else 1)
+            for field in fields}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='processes started per configuration')
+    parser.add_argument('--pages', type=int, default=50, help='page count of the PDF chatted with')
+    parser.add_argument('--pipeline', choices=('chain', 'lean'), default='chain')
+    parser.add_argument('--embedding-latency-ms', type=int, default=50, help='fake latency per embedding request')
+    parser.add_argument('--llm-latency-ms', type=int, default=300, help='fake latency before the first token')
+    parser.add_argument('--token-latency-ms', type=int, default=5, help='fake latency per further token')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against results saved earlier with --save')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression, e.g. 0.2 for 20%%')
+    parser.add_argument('--child', choices=('setup', 'measure'), help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--session-id', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Everything else the app prints goes before the result line
+        result = child_setup(args) if args.child == 'setup' else child_measure(args)
+        print(json.dumps(result))
+        return
+
+    save_path = os.path.abspath(args.save) if args.save else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    args.work_dir = tempfile.mkdtemp(prefix='startup-')
+    try:
+        args.session_id = run_child('setup', args)['session_id']
+        cold = [run_child('measure', args, PREWARM_SESSIONS='0') for _ in range(args.runs)]
+        prewarmed = [run_child('measure', args, PREWARM_SESSIONS='1') for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(args.work_dir, ignore_errors=True)
+
+    config = {key: value for key, value in vars(args).items() if key not in ('child', 'work_dir', 'session_id')}
+    results = {
+        'config': config,
+        'import': {
+            'seconds': summarize(cold, ['import_seconds'])['import_seconds'],
+            'google_clients_imported': any(run['google_clients_imported'] for run in cold)
+        },
+        'cold': summarize(cold, ['first_chat_ms', 'second_chat_ms']),
+        'prewarmed': summarize(prewarmed, ['warm_up_seconds', 'first_chat_ms', 'second_chat_ms'])
+    }
+    print(f"Import: {results['import']['seconds']}s"
+          f" (Google clients imported: {results['import']['google_clients_imported']})")
+    print(f"Cold: first chat {results['cold']['first_chat_ms']} ms, second {results['cold']['second_chat_ms']} ms")
+    print(f"Prewarmed: warm-up {results['prewarmed']['warm_up_seconds']}s, "
+          f"first chat {results['prewarmed']['first_chat_ms']} ms, second {results['prewarmed']['second_chat_ms']} ms")
+
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {save_path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.tolerance, TRACKED_METRICS)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
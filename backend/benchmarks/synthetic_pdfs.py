@@ -0,0 +1,95 @@
+"""Generate text PDFs of a given page count for benchmarks, without a PDF library.
+
+Pages hold numbered clauses of policy-like prose, so they split into
+chunks much like real documents and BM25 has distinctive terms to match.
+Run from the backend directory to write some to disk:
+
+    python benchmarks/synthetic_pdfs.py --pages 10,100 --output-dir /tmp/pdfs
+"""
+import argparse
+import os
+import random
+
+LINES_PER_PAGE = 48
+LINE_LEADING = 14
+SUBJECTS = ("Records", "Invoices", "Contracts", "Access logs", "Payroll data", "Backups", "Customer files", "Audit trails")
+VERBS = ("must be retained for", "are reviewed every", "are archived after", "may be deleted after", "are encrypted within")
+UNITS = ("days", "months", "years")
+QUALIFIERS = (
+    "unless a legal hold applies", "as set out in the schedule", "by the data owner",
+    "subject to regional law", "with written approval", "in the primary region"
+)
+
+
+def page_lines(rng, document_seed, page_number):
+    lines = [f"Document {document_seed} - Page {page_number + 1}"]
+    clause = 1
+    while len(lines) < LINES_PER_PAGE:
+        lines.append(
+            f"{page_number + 1}.{clause} {rng.choice(SUBJECTS)} (ref {rng.randrange(10000, 99999)}) "
+            f"{rng.choice(VERBS)} {rng.randint(1, 36)} {rng.choice(UNITS)}, {rng.choice(QUALIFIERS)}."
+        )
+        clause += 1
+    return lines
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(pages):
+    """Serialize pages (lists of lines) as a minimal PDF 1.4 file using the built-in Helvetica font."""
+    page_count = len(pages)
+    font_id = 3 + 2 * page_count
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{3 + 2 * i} 0 R" for i in range(page_count)), page_count
+        )
+    ]
+    for i, lines in enumerate(pages):
+        text = " T*\n".join(f"({_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf {LINE_LEADING} TL 40 760 Td\n{text}\nET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def write_pdf(path, page_count, seed=0):
+    """Write a ``page_count``-page PDF whose text is determined by ``seed``."""
+    rng = random.Random(seed)
+    with open(path, "wb") as f:
+        f.write(build_pdf([page_lines(rng, seed, i) for i in range(page_count)]))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="10,100", help="comma-separated page counts, one PDF each")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for i, page_count in enumerate(int(p) for p in args.pages.split(",")):
+        path = write_pdf(os.path.join(args.output_dir, f"synthetic_{page_count}p.pdf"), page_count, seed=args.seed + i)
+        print(f"Wrote {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
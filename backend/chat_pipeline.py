@@ -0,0 +1,69 @@
+import json
+
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from langchain.prompts import PromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate
+
+HUMAN_TEMPLATE = """Document content:
+
+{context}
+
+Question: {question}
+
+Previous conversation:
+{chat_history}
+
+Provide a direct analysis of the document content."""
+
+SUMMARY_PROMPT = PromptTemplate.from_template("""Progressively summarize a conversation between a user and Codex, \
+a document analysis assistant, adding to the previous summary. Keep the facts, figures, \
+document details and open questions the user may refer back to. Use at most {max_words} words.
+
+Previous summary:
+{summary}
+
+New lines of conversation:
+{chat_history}
+
+New summary:""")
+
+
+def build_chat_prompt(system_template):
+    """Combine a CHAT_MODES system message with the document question template."""
+    return ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(system_template),
+        HumanMessagePromptTemplate.from_template(HUMAN_TEMPLATE)
+    ])
+
+
+def format_chat_history(chats, summary=None):
+    """Render previous Chat rows (oldest first) the way ConversationalRetrievalChain does.
+
+    A ``summary`` of earlier turns, if given, comes first.
+    """
+    history = "".join(f"\nHuman: {chat.message}\nAssistant: {chat.response}" for chat in chats)
+    if summary:
+        history = f"\nSummary of earlier conversation: {summary}" + history
+    return history
+
+
+def condense_question(llm, question, chat_history):
+    """Rewrite a follow-up question as a standalone question for retrieval."""
+    if not chat_history:
+        return question
+    prompt = CONDENSE_QUESTION_PROMPT.format(chat_history=chat_history, question=question)
+    return llm.invoke(prompt).strip() or question
+
+
+def summarize_chat_history(llm, summary, chat_history, max_words):
+    """Fold more turns into a conversation's rolling summary."""
+    prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", chat_history=chat_history, max_words=max_words)
+    return llm.invoke(prompt).strip()
+
+
+def format_documents(documents):
+    return "\n\n".join(document.page_content for document in documents)
+
+
+def sse_event(event, data):
+    """Encode one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
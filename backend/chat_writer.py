@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from models import db, Chat, Session
+
+
+class ChatWriteQueue:
+    """Write-behind queue that commits chat turns in batches on a background thread.
+
+    Each batch inserts its Chat rows and bumps each session's message_count
+    in one transaction, instead of one commit per request. Until a session's
+    turns are committed, message_count() reports the count including them, so
+    the history cache and chat counts agree with what the user has been shown.
+    """
+
+    def __init__(self, app, batch_size=100, flush_interval=0.05, max_retries=3, max_tracked_sessions=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_tracked_sessions = max_tracked_sessions
+        self._queue = []
+        self._pending = defaultdict(int)
+        # Message count each session will have once its queued turns are written
+        self._expected = OrderedDict()
+        self._writing = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name='chat-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, turn, message_count):
+        """Queue ``turn``, the keyword arguments of a Chat row; ``message_count`` is its session's count including it."""
+        session_id = turn['session_id']
+        with self._condition:
+            self._queue.append(turn)
+            self._pending[session_id] += 1
+            self._expected[session_id] = message_count
+            self._expected.move_to_end(session_id)
+            while len(self._expected) > self.max_tracked_sessions:
+                oldest = next(iter(self._expected))
+                if self._pending.get(oldest):
+                    break
+                del self._expected[oldest]
+            self._condition.notify_all()
+
+    def message_count(self, session_id, stored_count):
+        """A session's message count, given the count read from the database, including queued turns."""
+        with self._condition:
+            expected = self._expected.get(session_id)
+            if expected is None:
+                return stored_count
+            if stored_count >= expected and not self._pending.get(session_id):
+                del self._expected[session_id]
+            return max(stored_count, expected)
+
+    def wait_for(self, session_id, timeout=None):
+        """Block until every queued turn of ``session_id`` has been written (or given up on)."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending.get(session_id), timeout)
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._writing, timeout)
+
+    def close(self, timeout=10):
+        """Write what is queued and stop the writer thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def _take_batch(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or self._closed)
+            if not self._queue:
+                return None
+            # Give concurrent requests a moment to join this batch
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._queue) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    break
+            batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            self._writing += 1
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            written = self._write(batch)
+            with self._condition:
+                self._writing -= 1
+                for turn in batch:
+                    session_id = turn['session_id']
+                    self._pending[session_id] -= 1
+                    if not self._pending[session_id]:
+                        del self._pending[session_id]
+                        if not written:
+                            # Those turns are lost, so don't keep reporting them
+                            self._expected.pop(session_id, None)
+                self._condition.notify_all()
+
+    def _write(self, batch):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._write_batch(batch)
+                self.batches += 1
+                self.written += len(batch)
+                return True
+            except Exception as e:
+                print(f"Chat write failed ({str(e)}), attempt {attempt} of {self.max_retries}")
+                time.sleep(0.1 * 2 ** attempt)
+        self.failed += len(batch)
+        return False
+
+    def _write_batch(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.add_all([Chat(**turn) for turn in batch])
+                for session_id, count in Counter(turn['session_id'] for turn in batch).items():
+                    Session.query.filter_by(id=session_id).update(
+                        {Session.message_count: Session.message_count + count},
+                        synchronize_session=False
+                    )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'queued': len(self._queue),
+                'batches': self.batches,
+                'written': self.written,
+                'failed': self.failed
+            }
@@ -0,0 +1,120 @@
+import json
+import mmap
+import os
+
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+CHUNKS_FILENAME = "chunks.bin"
+OFFSETS_FILENAME = "chunk_offsets.npy"
+IDS_FILENAME = "chunk_ids.json"
+
+
+class ChunkStore(Docstore, AddableMixin):
+    """Docstore that reads chunks from an offset-indexed file on demand.
+
+    ``chunks.bin`` holds one JSON record (text and metadata) per chunk, in
+    FAISS index order, and ``chunk_offsets.npy`` holds where each record
+    starts. Both are memory-mapped, so loading a session costs only the id
+    list and a search only decodes the chunks it returns.
+
+    Adds and deletes are kept in memory until the session is saved again
+    with ``save_chunks``.
+    """
+
+    def __init__(self, folder_path):
+        with open(os.path.join(folder_path, IDS_FILENAME)) as f:
+            self.ids = json.load(f)
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self._offsets = np.load(os.path.join(folder_path, OFFSETS_FILENAME), mmap_mode='r')
+        with open(os.path.join(folder_path, CHUNKS_FILENAME), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._added = {}
+        self._deleted = set()
+
+    def __contains__(self, chunk_id):
+        if chunk_id in self._added:
+            return True
+        return chunk_id in self._positions and chunk_id not in self._deleted
+
+    def search(self, search):
+        if search in self._added:
+            return self._added[search]
+        if search not in self:
+            return f"ID {search} not found."
+
+        position = self._positions[search]
+        record = json.loads(self._data[self._offsets[position]:self._offsets[position + 1]])
+        return Document(id=search, page_content=record['text'], metadata=record['metadata'])
+
+    def add(self, texts):
+        overlapping = [chunk_id for chunk_id in texts if chunk_id in self]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._added.update(texts)
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            if chunk_id not in self:
+                raise ValueError(f"Tried to delete an id that does not exist: {chunk_id}")
+            if self._added.pop(chunk_id, None) is None:
+                self._deleted.add(chunk_id)
+
+    def estimate_bytes(self):
+        resident = len(self.ids) * 100
+        resident += sum(len(document.page_content) + 200 for document in self._added.values())
+        return resident
+
+
+def has_chunks(folder_path):
+    return os.path.exists(os.path.join(folder_path, IDS_FILENAME))
+
+
+class ChunkWriter:
+    """Writes the files of a ``ChunkStore`` one batch of chunks at a time.
+
+    Records go to disk as they are added; only their offsets and ids are
+    kept until ``close``. Each file is written beside the old one and
+    renamed into place on close, so open memory maps of a previous version
+    stay valid.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self._chunks_path = os.path.join(folder_path, CHUNKS_FILENAME)
+        self._file = open(self._chunks_path + ".tmp", "wb")
+        self._offsets = [0]
+        self._ids = []
+
+    def add(self, chunks):
+        """Append ``(chunk id, Document)`` pairs, in index order."""
+        for chunk_id, document in chunks:
+            record = json.dumps({'text': document.page_content, 'metadata': document.metadata}).encode()
+            self._file.write(record)
+            self._offsets.append(self._offsets[-1] + len(record))
+            self._ids.append(chunk_id)
+
+    def close(self):
+        self._file.close()
+
+        offsets_path = os.path.join(self.folder_path, OFFSETS_FILENAME)
+        with open(offsets_path + ".tmp", "wb") as f:
+            np.save(f, np.array(self._offsets, dtype=np.int64))
+
+        ids_path = os.path.join(self.folder_path, IDS_FILENAME)
+        with open(ids_path + ".tmp", "w") as f:
+            json.dump(self._ids, f)
+
+        # The id list goes last, so an interrupted first save is never loaded as complete
+        os.replace(self._chunks_path + ".tmp", self._chunks_path)
+        os.replace(offsets_path + ".tmp", offsets_path)
+        os.replace(ids_path + ".tmp", ids_path)
+
+
+def save_chunks(folder_path, chunks):
+    """Write ``(chunk id, Document)`` pairs, in index order, for ``ChunkStore``."""
+    writer = ChunkWriter(folder_path)
+    writer.add(chunks)
+    writer.close()
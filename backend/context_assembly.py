@@ -0,0 +1,139 @@
+from langchain_core.documents import Document
+
+from ingestion import CHUNK_OVERLAP
+
+# Gemini averages about four characters of English text per token
+CHARS_PER_TOKEN = 4
+# Shorter shared runs between chunks are treated as coincidence, not overlap
+MIN_OVERLAP_CHARS = 20
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def count_document_tokens(documents):
+    return sum(estimate_tokens(document.page_content) for document in documents)
+
+
+def _source_key(document):
+    """Chunks can only overlap when they were split from the same page of the same file."""
+    metadata = document.metadata
+    return metadata.get('content_hash') or metadata.get('source'), metadata.get('page')
+
+
+def _join_text(first, second):
+    """Join two chunks that share text, or return None if they don't.
+
+    Chunks saved before start_index was recorded are matched on the text
+    itself: one contains the other, or one ends with the other's start.
+    """
+    if second in first:
+        return first
+    if first in second:
+        return second
+    for a, b in ((first, second), (second, first)):
+        # Look for b's opening words in a's tail; the first match that runs to the end is the longest overlap
+        probe = b[:MIN_OVERLAP_CHARS]
+        position = a.find(probe, max(0, len(a) - CHUNK_OVERLAP))
+        while position != -1:
+            if b.startswith(a[position:]):
+                return a[:position] + b
+            position = a.find(probe, position + 1)
+    return None
+
+
+def _merge_spans(documents):
+    """Merge chunks with start_index positions, in page order. Returns (start, text) pairs."""
+    documents = sorted(documents, key=lambda document: document.metadata['start_index'])
+    spans = []
+    for document in documents:
+        start = document.metadata['start_index']
+        text = document.page_content
+        if spans and start <= spans[-1][0] + len(spans[-1][1]):
+            span_start, span_text = spans[-1]
+            end = span_start + len(span_text)
+            spans[-1] = (span_start, span_text + text[end - start:])
+        else:
+            spans.append((start, text))
+    return spans
+
+
+def _merge_texts(documents):
+    """Merge chunks without positions by repeatedly joining any two that share text."""
+    texts = [document.page_content for document in documents]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(texts)):
+            for j in range(i + 1, len(texts)):
+                joined = _join_text(texts[i], texts[j])
+                if joined is not None:
+                    texts[i] = joined
+                    del texts[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [(None, text) for text in texts]
+
+
+def merge_chunks(documents):
+    """Merge retrieved chunks that overlap or touch, so no text is sent twice.
+
+    ``documents`` are in rank order. Each merged passage takes the place of
+    its best-ranked chunk, and keeps that chunk's id and metadata.
+    """
+    groups = {}
+    for rank, document in enumerate(documents):
+        groups.setdefault(_source_key(document), []).append((rank, document))
+
+    passages = []
+    for members in groups.values():
+        group = [document for _, document in members]
+        if all('start_index' in document.metadata for document in group):
+            spans = _merge_spans(group)
+        else:
+            spans = _merge_texts(group)
+
+        for start, text in spans:
+            # The best-ranked chunk whose text ended up in this passage
+            rank, best = next((rank, document) for rank, document in members if document.page_content in text)
+            metadata = dict(best.metadata)
+            if start is not None:
+                metadata['start_index'] = start
+            passages.append((rank, Document(page_content=text, metadata=metadata, id=best.id)))
+
+    passages.sort(key=lambda passage: passage[0])
+    return [document for _, document in passages]
+
+
+def assemble_context(documents, max_tokens):
+    """Pick and merge retrieved chunks to fill a token budget.
+
+    Chunks are taken in rank order, skipping any that would push the
+    merged context over ``max_tokens``; a chunk that overlaps one already
+    taken only costs its new text. The best chunk is always included, so
+    the number of chunks sent adapts to their size, overlap and the budget.
+    """
+    selected = []
+    context = []
+    for document in documents:
+        candidate = merge_chunks(selected + [document])
+        if selected and count_document_tokens(candidate) > max_tokens:
+            continue
+        selected.append(document)
+        context = candidate
+    return context
+
+
+def select_recent_turns(chats, max_tokens):
+    """The newest turns (``chats`` newest first) that fit in ``max_tokens``; the latest one is always kept."""
+    selected = []
+    tokens = 0
+    for chat in chats:
+        tokens += estimate_tokens(chat.message) + estimate_tokens(chat.response)
+        if selected and tokens > max_tokens:
+            break
+        selected.append(chat)
+    return selected
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+# HTTP statuses worth retrying: rate limited or a transient server-side failure
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable_error(error):
+    """True for 429/5xx errors, including ones wrapped by the langchain client."""
+    while error is not None:
+        status = getattr(error, 'code', None)
+        if callable(status):
+            status = None
+        status = status or getattr(error, 'status_code', None)
+        if status in RETRYABLE_STATUS_CODES:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class TokenBucket:
+    """Blocking token bucket: ``rate`` tokens per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Schedules calls to an embedding backend for ingestion throughput.
+
+    Documents are split into batches of ``batch_size`` and embedded
+    concurrently, with at most ``max_in_flight`` requests outstanding across
+    all callers. Every request takes a token from a shared rate limiter and
+    is retried with jittered exponential backoff on 429/5xx errors.
+    """
+
+    def __init__(self, embeddings, batch_size=100, max_in_flight=4,
+                 requests_per_minute=None, max_retries=6):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='embed')
+        self._rate_limiter = (
+            TokenBucket(rate=requests_per_minute / 60, capacity=max_in_flight)
+            if requests_per_minute else None
+        )
+        self.requests = 0
+        self.retries = 0
+
+    def embed_documents(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._call(self.embeddings.embed_documents, texts) if texts else []
+
+        # map() keeps batch order, so vectors line up with their texts
+        results = self._executor.map(
+            lambda batch: self._call(self.embeddings.embed_documents, batch),
+            batches
+        )
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text):
+        return self._call(self.embeddings.embed_query, text)
+
+    def _call(self, fn, payload):
+        retrying = Retrying(
+            retry=retry_if_exception(is_retryable_error),
+            wait=wait_random_exponential(multiplier=0.5, max=30),
+            stop=stop_after_attempt(self.max_retries),
+            before_sleep=self._on_retry,
+            reraise=True
+        )
+        for attempt in retrying:
+            with attempt:
+                if self._rate_limiter:
+                    self._rate_limiter.acquire()
+                with self._in_flight:
+                    self.requests += 1
+                    return fn(payload)
+
+    def _on_retry(self, retry_state):
+        self.retries += 1
+        print(f"Embedding request failed ({retry_state.outcome.exception()}), "
+              f"retrying (attempt {retry_state.attempt_number})")
@@ -0,0 +1,265 @@
+import math
+import os
+import pickle
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from chunk_store import ChunkStore, has_chunks, save_chunks
+
+INDEX_TYPES = ('flat', 'hnsw', 'ivf', 'pq')
+# How flat, HNSW and IVF indexes encode vectors; PQ has its own compression
+VECTOR_DTYPES = {'float32': "Flat", 'float16': "SQfp16", 'int8': "SQ8"}
+LEGACY_DOCSTORE_FILENAME = "index.pkl"
+VECTOR_SPOOL_FILENAME = "vectors.spool"
+
+# Below these sizes there aren't enough vectors to train the clustering / codebooks
+MIN_TRAINING_VECTORS = {'ivf': 1000, 'pq': 256 * 39}
+
+
+def get_index_type(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 'pq'
+    if isinstance(index, faiss.IndexIVF):
+        return 'ivf'
+    return 'flat'
+
+
+def get_vector_dtype(index):
+    """Vector encoding of a flat, HNSW or IVF index, or None for PQ."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return None
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return {faiss.ScalarQuantizer.QT_fp16: 'float16', faiss.ScalarQuantizer.QT_8bit: 'int8'}.get(index.sq.qtype)
+    return 'float32'
+
+
+def get_pq_subquantizers(dimension):
+    """Largest sub-quantizer count (at most 64) that divides the vector dimension."""
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+class FaissIndexPolicy:
+    """Picks, builds and loads session FAISS indexes according to their size.
+
+    Small sessions use an exact flat index. As the vector count grows they
+    move to HNSW, then IVF, then IVF with product quantization, unless
+    ``index_type`` pins one type. Rebuilds reuse the vectors already in the
+    index, so nothing is re-embedded (PQ codes are lossy, so rebuilding from a
+    PQ index keeps its quantization error).
+
+    Flat, HNSW and IVF indexes store vectors as ``vector_dtype``: float32,
+    float16 (half the memory, negligible recall loss) or int8 (a quarter,
+    with per-dimension ranges learned when the index is built; later
+    vectors outside them are clipped).
+
+    Chunk texts are kept in a ``ChunkStore`` beside the index instead of a
+    pickled docstore. Sessions saved in the old ``index.pkl`` layout still
+    load and are converted on their next save.
+
+    Index files at least ``mmap_min_bytes`` long are opened memory-mapped.
+    Only IVF and PQ indexes benefit: their inverted lists stay on disk and
+    are paged in by the OS, while flat and HNSW indexes are always read into
+    memory. Memory-mapped indexes are read-only, so writers must load with
+    ``mmap=False``.
+    """
+
+    def __init__(self, index_type='auto', vector_dtype='float16', hnsw_min_vectors=50_000, ivf_min_vectors=500_000,
+                 pq_min_vectors=2_000_000, hnsw_ef_search=64, ivf_nprobe=16, mmap_min_bytes=64 * 1024 * 1024):
+        if index_type != 'auto' and index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
+        if vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype: {vector_dtype}")
+        self.index_type = index_type
+        self.vector_dtype = vector_dtype
+        self.hnsw_min_vectors = hnsw_min_vectors
+        self.ivf_min_vectors = ivf_min_vectors
+        self.pq_min_vectors = pq_min_vectors
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivf_nprobe = ivf_nprobe
+        self.mmap_min_bytes = mmap_min_bytes
+
+    def choose(self, vector_count):
+        if self.index_type != 'auto':
+            index_type = self.index_type
+        elif vector_count >= self.pq_min_vectors:
+            index_type = 'pq'
+        elif vector_count >= self.ivf_min_vectors:
+            index_type = 'ivf'
+        elif vector_count >= self.hnsw_min_vectors:
+            index_type = 'hnsw'
+        else:
+            index_type = 'flat'
+
+        if index_type == 'pq' and vector_count < MIN_TRAINING_VECTORS['pq']:
+            index_type = 'ivf'
+        if index_type == 'ivf' and vector_count < MIN_TRAINING_VECTORS['ivf']:
+            index_type = 'flat'
+        return index_type
+
+    def build(self, vectors, index_type, metric_type=faiss.METRIC_L2):
+        """Build and fill a new index of ``index_type`` from an (n, d) float32 array."""
+        count, dimension = vectors.shape
+        encoding = VECTOR_DTYPES[self.vector_dtype]
+        if index_type == 'hnsw':
+            description = "HNSW32" if encoding == "Flat" else f"HNSW32,{encoding}"
+        elif index_type in ('ivf', 'pq'):
+            nlist = max(1, min(int(4 * math.sqrt(count)), count // 39))
+            if index_type == 'pq':
+                encoding = f"PQ{get_pq_subquantizers(dimension)}"
+            description = f"IVF{nlist},{encoding}"
+        else:
+            description = encoding
+
+        index = faiss.index_factory(dimension, description, metric_type)
+        if not index.is_trained:
+            if index_type in ('ivf', 'pq'):
+                # 256 points per list is plenty for k-means; train on a sample
+                sample_size = min(count, 256 * faiss.extract_index_ivf(index).nlist)
+                index.train(vectors[np.random.default_rng(0).choice(count, sample_size, replace=False)])
+            else:
+                index.train(vectors)
+        index.add(vectors)
+        self.configure(index)
+        return index
+
+    def configure(self, index):
+        """Apply search-time parameters, which may have changed since the index was saved."""
+        index_type = get_index_type(index)
+        if index_type == 'hnsw':
+            faiss.downcast_index(index).hnsw.efSearch = self.hnsw_ef_search
+        elif index_type in ('ivf', 'pq'):
+            faiss.extract_index_ivf(index).nprobe = self.ivf_nprobe
+
+    def fit(self, vectorstore):
+        """Rebuild the vectorstore's index in place if its size calls for another type or encoding."""
+        index = vectorstore.index
+        index_type = self.choose(index.ntotal)
+        vector_dtype = None if index_type == 'pq' else self.vector_dtype
+        if index.ntotal and (index_type, vector_dtype) != (get_index_type(index), get_vector_dtype(index)):
+            vectorstore.index = self.build(index.reconstruct_n(0, index.ntotal), index_type, index.metric_type)
+        return vectorstore
+
+    def append(self, vectorstore, other):
+        """Add ``other``'s vectors and chunks to ``vectorstore``.
+
+        Unlike ``FAISS.merge_from`` this works across index types and leaves
+        ``other`` intact.
+        """
+        start = vectorstore.index.ntotal
+        vectorstore.index.add(other.index.reconstruct_n(0, other.index.ntotal))
+        docstore_ids = [other.index_to_docstore_id[i] for i in range(other.index.ntotal)]
+        # One add call: InMemoryDocstore copies its whole dict on every add
+        vectorstore.docstore.add({docstore_id: other.docstore.search(docstore_id) for docstore_id in docstore_ids})
+        for i, docstore_id in enumerate(docstore_ids):
+            vectorstore.index_to_docstore_id[start + i] = docstore_id
+
+    def remove(self, vectorstore, ids):
+        """Delete chunks by docstore id.
+
+        Only flat indexes renumber the remaining vectors on ``remove_ids`` the
+        way ``FAISS.delete`` expects. HNSW can't remove vectors at all and IVF
+        keeps the original labels, so those are rebuilt from the kept vectors.
+        """
+        if get_index_type(vectorstore.index) == 'flat':
+            vectorstore.delete(ids)
+            return
+
+        removed = set(ids)
+        index = vectorstore.index
+        kept = [i for i in range(index.ntotal) if vectorstore.index_to_docstore_id[i] not in removed]
+        vectors = index.reconstruct_n(0, index.ntotal)[kept]
+        kept_ids = [vectorstore.index_to_docstore_id[i] for i in kept]
+        vectorstore.docstore.delete(ids)
+        vectorstore.index_to_docstore_id = dict(enumerate(kept_ids))
+        if kept:
+            vectorstore.index = self.build(vectors, self.choose(len(kept)), index.metric_type)
+        else:
+            index.reset()
+
+    def load(self, folder_path, embeddings, mmap=True):
+        """Open a vectorstore saved by ``save``, or by ``FAISS.save_local`` before chunk stores existed."""
+        index_path = os.path.join(folder_path, "index.faiss")
+        flags = 0
+        if mmap and os.path.getsize(index_path) >= self.mmap_min_bytes:
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(index_path, flags)
+        self.configure(index)
+
+        if has_chunks(folder_path):
+            docstore = ChunkStore(folder_path)
+            index_to_docstore_id = dict(enumerate(docstore.ids))
+        else:
+            with open(os.path.join(folder_path, LEGACY_DOCSTORE_FILENAME), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+
+        vectorstore = FAISS(embeddings, index, docstore, index_to_docstore_id)
+        vectorstore.memory_mapped = bool(flags) and get_index_type(index) in ('ivf', 'pq')
+        return vectorstore
+
+    def save(self, vectorstore, folder_path):
+        """Save the index and its chunks, replacing any legacy pickled docstore.
+
+        Files are written beside the old ones and renamed into place, so
+        readers that memory-mapped the previous version keep a valid mapping.
+        """
+        os.makedirs(folder_path, exist_ok=True)
+        index_path = os.path.join(folder_path, "index.faiss")
+        faiss.write_index(vectorstore.index, index_path + ".tmp")
+
+        save_chunks(folder_path, (
+            (vectorstore.index_to_docstore_id[i], vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]))
+            for i in range(vectorstore.index.ntotal)
+        ))
+        os.replace(index_path + ".tmp", index_path)
+
+        legacy_path = os.path.join(folder_path, LEGACY_DOCSTORE_FILENAME)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+    def should_mmap(self, folder_path):
+        index_path = os.path.join(folder_path, "index.faiss")
+        return os.path.exists(index_path) and os.path.getsize(index_path) >= self.mmap_min_bytes
+
+
+class VectorWriter:
+    """Builds and saves a policy's index from vectors added one batch at a time.
+
+    Vectors are spooled to a file in ``folder_path`` instead of being kept
+    in memory. On ``close`` the index, of the type their total count calls
+    for, is built from a memory map of that file and saved beside chunks
+    written in the same order with ``ChunkWriter``.
+    """
+
+    def __init__(self, policy, folder_path, metric_type=faiss.METRIC_L2):
+        self.policy = policy
+        self.folder_path = folder_path
+        self.metric_type = metric_type
+        self.count = 0
+        self._dimension = None
+        self._spool_path = os.path.join(folder_path, VECTOR_SPOOL_FILENAME)
+        self._file = open(self._spool_path, "wb")
+
+    def add(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self._dimension = vectors.shape[1]
+        self._file.write(vectors.tobytes())
+        self.count += len(vectors)
+
+    def close(self):
+        self._file.close()
+        vectors = np.memmap(self._spool_path, dtype=np.float32, mode='r', shape=(self.count, self._dimension))
+        index = self.policy.build(vectors, self.policy.choose(self.count), self.metric_type)
+        del vectors
+        faiss.write_index(index, os.path.join(self.folder_path, "index.faiss"))
+        os.remove(self._spool_path)
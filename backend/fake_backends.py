@@ -0,0 +1,91 @@
+"""Deterministic local stand-ins for the Google model clients.
+
+Used to run and measure the backend offline, without API keys or network calls.
+"""
+import hashlib
+import random
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+ANSWER_WORDS = (
+    "the", "document", "states", "that", "each", "section", "clause", "applies", "to", "records",
+    "within", "period", "of", "years", "and", "must", "be", "reviewed", "by", "owner"
+)
+
+
+class FakeRateLimitError(Exception):
+    code = 429
+
+
+class FakeEmbeddings(Embeddings):
+    """Hash-based embeddings with a configurable per-request latency.
+
+    The same text always maps to the same unit vector. ``error_rate`` makes
+    that fraction of requests fail with a 429 so retry behaviour can be
+    exercised.
+    """
+
+    def __init__(self, dimension=768, latency_seconds=0.0, per_text_latency_seconds=0.0, error_rate=0.0):
+        self.dimension = dimension
+        self.latency_seconds = latency_seconds
+        self.per_text_latency_seconds = per_text_latency_seconds
+        self.error_rate = error_rate
+
+    def _request(self, count):
+        time.sleep(self.latency_seconds + count * self.per_text_latency_seconds)
+        if self.error_rate and random.random() < self.error_rate:
+            raise FakeRateLimitError("Resource has been exhausted (fake)")
+
+    def _embed(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        self._request(len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self._request(1)
+        return self._embed(text)
+
+
+class FakeLLM(LLM):
+    """Answers made of words picked from a hash of the prompt, with configurable latency.
+
+    ``latency_seconds`` is the delay before the first token and
+    ``token_latency_seconds`` the delay for each token after it, whether the
+    answer is streamed or returned whole.
+    """
+
+    latency_seconds: float = 0.0
+    token_latency_seconds: float = 0.0
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _tokens(self, prompt):
+        seed = int.from_bytes(hashlib.sha256(prompt.encode('utf-8')).digest()[:8], 'little')
+        rng = random.Random(seed)
+        return [rng.choice(ANSWER_WORDS) + " " for _ in range(self.answer_words)]
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens(prompt)
+        time.sleep(self.latency_seconds + self.token_latency_seconds * (len(tokens) - 1))
+        return "".join(tokens).strip()
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_seconds)
+        for i, token in enumerate(self._tokens(prompt)):
+            if i:
+                time.sleep(self.token_latency_seconds)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,23 @@
+"""Gunicorn settings for production. From the backend directory:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each gthread worker serves up to GUNICORN_THREADS requests at once on OS
+threads. Ingestion and history summaries run on the worker's own thread
+pools, so parsing, indexing, SQLite and file locks never stop it answering
+other requests. Caches (vectorstores, history, answers) are per worker process.
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+# gevent runs background jobs as greenlets, which stall every request while a PDF is ingested
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 128))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+# Long enough for a slow streamed answer
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+# Each worker loads the app itself: thread pools and gRPC channels don't survive a fork
+preload_app = False
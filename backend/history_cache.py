@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict, deque, namedtuple
+
+HistoryEntry = namedtuple('HistoryEntry', ['message', 'response'])
+
+
+class ChatHistoryCache:
+    """In-process LRU cache of each session's most recent chat turns.
+
+    Entries are tagged with the session's ``message_count`` when they were
+    filled. A lookup with a different count (a turn was stored by another
+    process, or rows were removed) is a miss, so the cache never serves
+    stale history even when several workers share the database.
+    """
+
+    def __init__(self, window, max_sessions=1000):
+        self.window = window
+        self.max_sessions = max_sessions
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id, message_count):
+        """Return up to ``window`` HistoryEntry items, newest first, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry[0] != message_count:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, session_id, message_count, chats):
+        """Fill the cache from Chat rows (newest first) read at ``message_count``; returns the entries."""
+        history = deque(
+            (HistoryEntry(chat.message, chat.response) for chat in chats[:self.window]),
+            maxlen=self.window
+        )
+        with self._lock:
+            self._entries[session_id] = (message_count, history)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+        return list(history)
+
+    def append(self, session_id, message_count, message, response):
+        """Record a newly stored turn; ``message_count`` is the count including it."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry[0] != message_count - 1:
+                # We didn't hold the history just before this turn
+                self._entries.pop(session_id, None)
+                return
+            entry[1].appendleft(HistoryEntry(message, response))
+            self._entries[session_id] = (message_count, entry[1])
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'sessions': len(self._entries),
+                'window': self.window,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,80 @@
+import hashlib
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+def get_text_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        # Lets retrieval merge overlapping chunks by position
+        add_start_index=True
+    )
+
+
+def hash_file(file_path):
+    """SHA-256 of a file's bytes, which identifies its document store."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_pdf_pages(file_path):
+    """Yield the PDF's pages one at a time; pypdf reads the file lazily."""
+    yield from PyPDFLoader(file_path).lazy_load()
+
+
+def iter_chunks(pages, text_splitter=None):
+    """Split pages as they arrive instead of waiting for the whole document."""
+    text_splitter = text_splitter or get_text_splitter()
+    for page in pages:
+        yield from text_splitter.split_documents([page])
+
+
+def iter_batches(items, batch_size):
+    """Group an iterable into lists of at most ``batch_size`` items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_pdf_chunk_batches(file_path, batch_size, on_page=None):
+    """Stream a PDF as fixed-size batches of chunks.
+
+    Only one page and one batch of chunks are held at a time, so memory
+    stays bounded regardless of page count. ``on_page`` is called after each
+    page is parsed.
+    """
+    def pages():
+        for page in iter_pdf_pages(file_path):
+            if on_page:
+                on_page()
+            yield page
+
+    yield from iter_batches(iter_chunks(pages()), batch_size)
+
+
+def parse_pdf(file_path):
+    """Parse and split a whole PDF, returning ``(page_count, chunks)``.
+
+    Runs in a worker process for bulk uploads, so it must stay a picklable
+    module-level function.
+    """
+    text_splitter = get_text_splitter()
+    page_count = 0
+    chunks = []
+    for page in iter_pdf_pages(file_path):
+        page_count += 1
+        chunks.extend(text_splitter.split_documents([page]))
+    return page_count, chunks
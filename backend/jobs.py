@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class Job:
+    """A unit of background work with progress that can be polled.
+
+    ``on_change(job)``, if given, is called when the job's status changes
+    and, at most every ``change_interval`` seconds, when its progress does.
+    It runs on the job's thread, so it must not raise.
+    """
+
+    def __init__(self, on_change=None, change_interval=1.0, **info):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.info = info
+        self.progress = {}
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.finished_time = None
+        self.on_change = on_change
+        self.change_interval = change_interval
+        self._changed_time = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, **progress):
+        with self._lock:
+            self.progress.update(progress)
+        self._progress_changed()
+
+    def increment(self, key, amount=1):
+        with self._lock:
+            self.progress[key] = self.progress.get(key, 0) + amount
+        self._progress_changed()
+
+    def set_status(self, status):
+        self.status = status
+        self.changed()
+
+    def changed(self):
+        if self.on_change:
+            self._changed_time = time.monotonic()
+            self.on_change(self)
+
+    def _progress_changed(self):
+        if self.on_change and time.monotonic() - self._changed_time >= self.change_interval:
+            self.changed()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                **self.info,
+                'progress': dict(self.progress),
+                'error': self.error,
+                'created_at': self.created_at.isoformat(),
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None
+            }
+
+
+class JobQueue:
+    """Runs jobs on a local thread pool and keeps their status in memory.
+
+    Finished jobs are forgotten after ``retention_seconds`` so the registry
+    doesn't grow without bound. ``on_change(job)`` is passed on to every
+    job, so its status can also be kept where other processes can read it.
+    """
+
+    def __init__(self, max_workers, retention_seconds=3600, thread_name_prefix='job', on_change=None,
+                 change_interval=1.0):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.retention_seconds = retention_seconds
+        self.on_change = on_change
+        self.change_interval = change_interval
+
+    def submit(self, fn, *args, on_done=None, **info):
+        """Queue ``fn(job, *args)`` and return the Job tracking it.
+
+        ``on_done(job)`` is called once the job has finished, whether it succeeded or not.
+        """
+        job = Job(on_change=self.on_change, change_interval=self.change_interval, **info)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job.changed()
+        self._executor.submit(self._run, job, fn, args, on_done)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, on_done):
+        job.set_status('running')
+        status = 'failed'
+        try:
+            fn(job, *args)
+            status = 'completed'
+        except Exception as e:
+            print(f"Job {job.id} failed: {str(e)}")
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.finished_time = time.time()
+            job.set_status(status)
+            if on_done:
+                on_done(job)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_time and job.finished_time < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
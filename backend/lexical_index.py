@@ -0,0 +1,147 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+# Keeps tokens like "7.2", "ID-31" and "v1.0" whole so exact references match
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+LEXICAL_INDEX_FILENAME = "bm25.json"
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index over chunk texts with Okapi BM25 scoring.
+
+    Chunks are keyed by the same ids as the FAISS docstore, so results from
+    both indexes can be fused. Only per-chunk term counts are saved; postings
+    are rebuilt on load.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._term_counts = {}
+        self._lengths = {}
+        self._postings = defaultdict(dict)
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._term_counts)
+
+    def add(self, ids, texts):
+        for chunk_id, text in zip(ids, texts):
+            if chunk_id in self._term_counts:
+                self._remove(chunk_id)
+            self._add(chunk_id, Counter(tokenize(text)))
+
+    def _add(self, chunk_id, term_counts):
+        self._term_counts[chunk_id] = term_counts
+        length = sum(term_counts.values())
+        self._lengths[chunk_id] = length
+        self._total_length += length
+        for term, count in term_counts.items():
+            self._postings[term][chunk_id] = count
+
+    def remove(self, ids):
+        for chunk_id in ids:
+            if chunk_id in self._term_counts:
+                self._remove(chunk_id)
+
+    def _remove(self, chunk_id):
+        term_counts = self._term_counts.pop(chunk_id)
+        self._total_length -= self._lengths.pop(chunk_id)
+        for term in term_counts:
+            postings = self._postings[term]
+            postings.pop(chunk_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query, k=4):
+        """Return up to ``k`` (chunk id, score) pairs, best first."""
+        return search_indexes([self], query, k=k)
+
+    def estimate_bytes(self):
+        postings = sum(len(chunk_ids) for chunk_ids in self._postings.values())
+        return postings * 100 + len(self._postings) * 80
+
+    def save(self, folder_path):
+        path = os.path.join(folder_path, LEXICAL_INDEX_FILENAME)
+        with open(path + ".tmp", "w") as f:
+            json.dump({'k1': self.k1, 'b': self.b, 'chunks': self._term_counts}, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, folder_path):
+        with open(os.path.join(folder_path, LEXICAL_INDEX_FILENAME)) as f:
+            data = json.load(f)
+        index = cls(k1=data['k1'], b=data['b'])
+        for chunk_id, term_counts in data['chunks'].items():
+            index._add(chunk_id, Counter(term_counts))
+        return index
+
+    @classmethod
+    def exists(cls, folder_path):
+        return os.path.exists(os.path.join(folder_path, LEXICAL_INDEX_FILENAME))
+
+
+class BM25Writer:
+    """Writes a file ``BM25Index.load`` can read one batch of chunks at a time, without keeping them in memory."""
+
+    def __init__(self, folder_path, k1=1.5, b=0.75):
+        self._path = os.path.join(folder_path, LEXICAL_INDEX_FILENAME)
+        self._file = open(self._path + ".tmp", "w")
+        self._file.write(f'{{"k1": {json.dumps(k1)}, "b": {json.dumps(b)}, "chunks": {{')
+        self._empty = True
+
+    def add(self, ids, texts):
+        for chunk_id, text in zip(ids, texts):
+            if not self._empty:
+                self._file.write(", ")
+            self._file.write(f"{json.dumps(chunk_id)}: {json.dumps(Counter(tokenize(text)))}")
+            self._empty = False
+
+    def close(self):
+        self._file.write("}}")
+        self._file.close()
+        os.replace(self._path + ".tmp", self._path)
+
+
+def search_indexes(indexes, query, k=4):
+    """BM25 search over several indexes as if they were one.
+
+    Document frequencies and the average chunk length are taken over all of
+    them, so scores from different documents' indexes are comparable.
+    """
+    indexes = [index for index in indexes if len(index)]
+    if not indexes:
+        return []
+
+    chunk_count = sum(len(index) for index in indexes)
+    average_length = sum(index._total_length for index in indexes) / chunk_count or 1
+    scores = defaultdict(float)
+    for term in set(tokenize(query)):
+        postings = [index._postings.get(term) for index in indexes]
+        document_frequency = sum(len(p) for p in postings if p)
+        if not document_frequency:
+            continue
+        idf = math.log(1 + (chunk_count - document_frequency + 0.5) / (document_frequency + 0.5))
+        for index, index_postings in zip(indexes, postings):
+            for chunk_id, count in (index_postings or {}).items():
+                length_norm = 1 - index.b + index.b * index._lengths[chunk_id] / average_length
+                scores[chunk_id] += idf * count * (index.k1 + 1) / (count + index.k1 * length_norm)
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked id lists into one, best first (Cormack et al., 2009)."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] += 1 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
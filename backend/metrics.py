@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Prometheus' default buckets, extended for LLM calls that take tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labelnames, key, (), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, with their sum and count, per label combination."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", self.labelnames, key, (('le', _format_value(bound)),), count))
+                samples.append((f"{self.name}_sum", self.labelnames, key, (), total))
+                samples.append((f"{self.name}_count", self.labelnames, key, (), counts[-1]))
+        return samples
+
+
+class CallbackMetric:
+    """A metric read from elsewhere (e.g. a cache's own counters) each time metrics are rendered.
+
+    ``callback`` returns a dict mapping label value tuples to values.
+    """
+
+    def __init__(self, name, documentation, labelnames, callback, type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.type = type
+
+    def samples(self):
+        return [(self.name, self.labelnames, key, (), value) for key, value in self.callback().items()]
+
+
+class MetricsRegistry:
+    """Holds the app's metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, labelnames, callback, type='gauge'):
+        return self.register(CallbackMetric(name, documentation, labelnames, callback, type))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labelnames, values, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, values, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestTrace:
+    """Stage timings and counts for one request, logged as a single JSON line when it finishes."""
+
+    def __init__(self, endpoint, request_id=None, stage_histogram=None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self.error = None
+        self._stage_histogram = stage_histogram
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as stage ``name``; repeated stages add up."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        if self._stage_histogram:
+            self._stage_histogram.observe(seconds, endpoint=self.endpoint, stage=name)
+
+    def count(self, name, amount=1):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def to_log(self, **fields):
+        return json.dumps({
+            'request_id': self.request_id,
+            'endpoint': self.endpoint,
+            **fields,
+            'duration_ms': round(self.elapsed() * 1000, 2),
+            'stages_ms': {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+            **({'counts': self.counts} if self.counts else {}),
+            **({'error': self.error} if self.error else {})
+        })
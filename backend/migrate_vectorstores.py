@@ -0,0 +1,63 @@
+"""Convert session vectorstores from the pickled docstore layout to chunk stores.
+
+Sessions saved before chunk stores existed have an ``index.pkl`` holding
+every chunk's text in a pickled InMemoryDocstore. This rewrites them with
+chunks in ``chunks.bin`` and vectors encoded as VECTOR_DTYPE, without
+re-embedding anything. The app converts a session on its next upload or
+delete anyway; this tool does it for all of them up front.
+
+Run it from the backend directory while the app is stopped:
+
+    python migrate_vectorstores.py [--vector-dtype float16] [--dry-run]
+"""
+import argparse
+import glob
+import os
+
+from dotenv import load_dotenv
+
+from chunk_store import has_chunks
+from fake_backends import FakeEmbeddings
+from faiss_index import LEGACY_DOCSTORE_FILENAME, VECTOR_DTYPES, FaissIndexPolicy
+
+
+def folder_size(folder_path):
+    return sum(entry.stat().st_size for entry in os.scandir(folder_path) if entry.is_file())
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectorstores", default="vectorstores", help="directory holding session_* folders")
+    parser.add_argument("--vector-dtype", choices=VECTOR_DTYPES, default=os.getenv("VECTOR_DTYPE", "float16"))
+    parser.add_argument("--dry-run", action="store_true", help="list the sessions that would be converted")
+    args = parser.parse_args()
+
+    policy = FaissIndexPolicy(
+        index_type=os.getenv("FAISS_INDEX_TYPE", "auto"),
+        vector_dtype=args.vector_dtype
+    )
+
+    converted = 0
+    for folder_path in sorted(glob.glob(os.path.join(args.vectorstores, "session_*"))):
+        if has_chunks(folder_path) or not os.path.exists(os.path.join(folder_path, LEGACY_DOCSTORE_FILENAME)):
+            continue
+        if args.dry_run:
+            print(f"Would convert {folder_path}")
+            continue
+
+        size_before = folder_size(folder_path)
+        # Nothing is embedded while rewriting an index, so any Embeddings will do
+        vectorstore = policy.load(folder_path, FakeEmbeddings(), mmap=False)
+        policy.fit(vectorstore)
+        policy.save(vectorstore, folder_path)
+        converted += 1
+        print(f"Converted {folder_path}: {vectorstore.index.ntotal} chunks, "
+              f"{size_before / 1024:.0f} KB -> {folder_size(folder_path) / 1024:.0f} KB")
+
+    if not args.dry_run:
+        print(f"Converted {converted} session(s)")
+
+
+if __name__ == "__main__":
+    main()
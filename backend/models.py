@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -19,10 +20,18 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
 
 class Session(db.Model):
+    # The sidebar lists a user's sessions newest first
+    __table_args__ = (db.Index('ix_session_user_id_created_at', 'user_id', 'created_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Number of Chat rows, kept in step by record_chat() so /chat needn't count them
+    message_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Rolling summary of the oldest summary_message_count chats, which no longer fit in prompts
+    history_summary = db.Column(db.Text)
+    summary_message_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     documents = db.relationship('Document', backref='session', lazy=True, cascade="all, delete-orphan")
     chats = db.relationship('Chat', backref='session', lazy=True, cascade="all, delete-orphan")
 
@@ -31,19 +40,111 @@ class Session(db.Model):
             'id': self.id,
             'name': self.name,
             'created_at': self.created_at.isoformat(),
-            'documents': [{'id': d.id, 'filename': d.filename} for d in self.documents]
+            'documents': [{'id': d.id, 'filename': d.filename, 'status': d.status} for d in self.documents]
         }
 
 class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
-    session_id = db.Column(db.Integer, db.ForeignKey('session.id'), nullable=False)
+    session_id = db.Column(db.Integer, db.ForeignKey('session.id'), nullable=False, index=True)
+    # pending -> processing -> ready | failed, set by the background ingestion job
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')
+    # SHA-256 of the uploaded file; documents with the same hash share one index under
+    # vectorstores/documents/. Null for documents indexed into a per-session index.
+    content_hash = db.Column(db.String(64), index=True)
 
 class Chat(db.Model):
+    # History is read per session, newest first
+    __table_args__ = (db.Index('ix_chat_session_id_created_at', 'session_id', 'created_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.Text, nullable=False)
     response = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     session_id = db.Column(db.Integer, db.ForeignKey('session.id'), nullable=False)
-    mode = db.Column(db.String(20), default='balanced') 
\ No newline at end of file
+    mode = db.Column(db.String(20), default='balanced')
+
+class IngestionJob(db.Model):
+    """Last known status and progress of a background ingestion job.
+
+    Jobs run in the worker process that accepted the upload, but the
+    frontend's progress polls may reach any worker, so /jobs reads this.
+    """
+    id = db.Column(db.String(32), primary_key=True)
+    # Not a foreign key: records outlive deleted sessions until they expire
+    session_id = db.Column(db.Integer, nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False)
+    info = db.Column(db.JSON, nullable=False)
+    progress = db.Column(db.JSON, nullable=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            **self.info,
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+# Statements that fill a column added by upgrade_schema() from existing data
+COLUMN_BACKFILLS = {
+    ('session', 'message_count'):
+        'UPDATE session SET message_count = (SELECT COUNT(*) FROM chat WHERE chat.session_id = session.id)'
+}
+
+def configure_sqlite(engine, busy_timeout_ms):
+    """Set up each new SQLite connection for concurrent requests.
+
+    WAL lets reads carry on while another connection writes, and the busy
+    timeout makes a writer wait for the lock instead of failing straight
+    away with "database is locked".
+    """
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        # In WAL mode this only risks the last commits on power loss, not corruption
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+
+def upgrade_schema():
+    """Add columns and indexes that were introduced after a table was created.
+
+    db.create_all() only creates missing tables, so existing databases need
+    new columns and indexes added in place. New columns must be nullable or
+    carry a server_default.
+    """
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                if not column.nullable:
+                    ddl += ' NOT NULL'
+                connection.execute(db.text(ddl))
+                backfill = COLUMN_BACKFILLS.get((table.name, column.name))
+                if backfill:
+                    connection.execute(db.text(backfill))
+                print(f"Added column {table.name}.{column.name}")
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    print(f"Created index {index.name}")
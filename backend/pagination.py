@@ -0,0 +1,49 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(row):
+    """Opaque cursor pointing just past ``row`` in (created_at, id) order."""
+    value = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor. Raises ValueError if it is malformed."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def paginate_newest_first(query, model, limit, cursor=None):
+    """Keyset pagination over (created_at, id), newest first.
+
+    Each page is an index range scan that starts where the previous one
+    ended, so it costs the same however deep the client has scrolled.
+    Returns the page's rows and the cursor for the next page (None on the
+    last one).
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id)
+        ))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def get_page_size(value, default, maximum):
+    """Parse a ``limit`` query parameter, falling back to ``default`` and capping at ``maximum``."""
+    if value is None:
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, maximum)
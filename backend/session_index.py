@@ -0,0 +1,67 @@
+from typing import Any, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from context_assembly import assemble_context
+from lexical_index import search_indexes
+
+
+class SessionIndex:
+    """The document indexes a session references, searched as one.
+
+    Every store is searched for its own top ``k`` and the candidates are
+    merged by distance, which gives the same result as one combined flat
+    index (all stores use L2 distance over the same embedding model).
+    Each store's index type follows its own size, so a session of many
+    small documents is searched as many flat indexes.
+    Lexical indexes are loaded only when a lexical search is made.
+    """
+
+    def __init__(self, vectorstores, lexical_index_loaders):
+        self.vectorstores = vectorstores
+        self._lexical_index_loaders = lexical_index_loaders
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        candidates = []
+        for vectorstore in self.vectorstores:
+            candidates.extend(vectorstore.similarity_search_with_score_by_vector(embedding, k=k))
+        candidates.sort(key=lambda candidate: candidate[1])
+        return [document for document, _ in candidates[:k]]
+
+    def lexical_search(self, query, k=4):
+        """BM25 (chunk id, score) pairs, scored with statistics over all the session's documents."""
+        return search_indexes([load() for load in self._lexical_index_loaders], query, k=k)
+
+    def get_chunks(self, ids):
+        """Look chunks up by id in whichever store holds them, keeping the order of ``ids``."""
+        documents = []
+        for chunk_id in ids:
+            for vectorstore in self.vectorstores:
+                document = vectorstore.docstore.search(chunk_id)
+                if isinstance(document, Document):
+                    documents.append(document)
+                    break
+        return documents
+
+    def as_retriever(self, embeddings, k=4, max_tokens=None):
+        return SessionRetriever(session_index=self, embeddings=embeddings, k=k, max_tokens=max_tokens)
+
+
+class SessionRetriever(BaseRetriever):
+    """Retriever over a SessionIndex, for ConversationalRetrievalChain.
+
+    With ``max_tokens`` set, the top ``k`` chunks are merged and trimmed to
+    that budget by assemble_context.
+    """
+
+    session_index: Any
+    embeddings: Any
+    k: int = 4
+    max_tokens: Optional[int] = None
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        documents = self.session_index.similarity_search_by_vector(self.embeddings.embed_query(query), k=self.k)
+        if self.max_tokens is not None:
+            documents = assemble_context(documents, self.max_tokens)
+        return documents
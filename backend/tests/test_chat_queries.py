@@ -0,0 +1,31 @@
+import pytest
+from flask import Flask
+
+from chat_queries import FAKE_ENVIRONMENT, MAX_QUERIES_PER_TURN, chat_turn_queries, load_app, setup_session
+
+TURNS = 5
+
+
+@pytest.fixture(scope="module")
+def chat(tmp_path_factory):
+    work_dir = str(tmp_path_factory.mktemp("chat-queries"))
+    # load_app changes the environment, working directory and instance path; put them back afterwards
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        for name, value in FAKE_ENVIRONMENT.items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.chdir(work_dir)
+        monkeypatch.setattr(Flask, "auto_find_instance_path", Flask.auto_find_instance_path)
+
+        chat_app = load_app(work_dir)
+        client, session_id = setup_session(chat_app)
+        yield chat_app, client, session_id
+
+
+@pytest.mark.parametrize("pipeline", ["chain", "lean"])
+def test_chat_turn_query_budget(chat, pipeline):
+    chat_app, client, session_id = chat
+    for turn in range(TURNS):
+        statements = chat_turn_queries(chat_app, client, session_id, pipeline, turn)
+        # The first turn fills the history cache
+        if turn:
+            assert len(statements) <= MAX_QUERIES_PER_TURN, statements
@@ -0,0 +1,79 @@
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from faiss_index import INDEX_TYPES, FaissIndexPolicy, get_index_type
+
+DIMENSION = 32
+VECTOR_COUNT = 2000
+
+
+def make_vectorstore(policy, index_type, vectors, start=0):
+    ids = [f"chunk-{start + i}" for i in range(len(vectors))]
+    docstore = InMemoryDocstore({docstore_id: Document(page_content=docstore_id) for docstore_id in ids})
+    if index_type == 'pq':
+        # 8-bit PQ codebooks take minutes to train; 4-bit ones make the same kind of index
+        index = faiss.index_factory(DIMENSION, "IVF16,PQ16x4")
+        index.train(vectors)
+        index.add(vectors)
+        policy.configure(index)
+    else:
+        index = policy.build(vectors, index_type)
+    assert get_index_type(index) == index_type
+    return FAISS(None, index, docstore, dict(enumerate(ids)))
+
+
+def stored_vectors(vectorstore):
+    """The vectors as the index encoded them, so lossy encodings still find themselves."""
+    return vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+
+
+def top_chunks(vectorstore, vector, k=5):
+    return [doc.page_content for doc, _ in vectorstore.similarity_search_with_score_by_vector(vector, k=k)]
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_search_after_remove(index_type):
+    policy = FaissIndexPolicy(index_type=index_type)
+    vectors = np.random.default_rng(0).standard_normal((VECTOR_COUNT, DIMENSION)).astype('float32')
+    vectorstore = make_vectorstore(policy, index_type, vectors)
+    vectors = stored_vectors(vectorstore)
+
+    policy.remove(vectorstore, [f"chunk-{i}" for i in range(0, VECTOR_COUNT, 2)])
+
+    assert vectorstore.index.ntotal == VECTOR_COUNT // 2
+    assert len(vectorstore.index_to_docstore_id) == VECTOR_COUNT // 2
+    for i in range(1, VECTOR_COUNT, 50):
+        found = top_chunks(vectorstore, vectors[i])
+        assert found[0] == f"chunk-{i}"
+        assert all(int(chunk.split('-')[1]) % 2 for chunk in found)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_append_after_remove(index_type):
+    policy = FaissIndexPolicy(index_type=index_type)
+    vectors = np.random.default_rng(1).standard_normal((VECTOR_COUNT + 100, DIMENSION)).astype('float32')
+    vectorstore = make_vectorstore(policy, index_type, vectors[:VECTOR_COUNT])
+    vectors[:VECTOR_COUNT] = stored_vectors(vectorstore)
+    policy.remove(vectorstore, [f"chunk-{i}" for i in range(VECTOR_COUNT // 2)])
+
+    policy.append(vectorstore, make_vectorstore(FaissIndexPolicy(), 'flat', vectors[VECTOR_COUNT:], VECTOR_COUNT))
+
+    assert vectorstore.index.ntotal == len(vectorstore.index_to_docstore_id) == VECTOR_COUNT // 2 + 100
+    for i in list(range(VECTOR_COUNT // 2, VECTOR_COUNT, 50)) + list(range(VECTOR_COUNT, VECTOR_COUNT + 100, 10)):
+        assert top_chunks(vectorstore, vectors[i])[0] == f"chunk-{i}"
+
+
+def test_remove_everything():
+    policy = FaissIndexPolicy(index_type='ivf')
+    vectors = np.random.default_rng(2).standard_normal((VECTOR_COUNT, DIMENSION)).astype('float32')
+    vectorstore = make_vectorstore(policy, 'ivf', vectors)
+
+    policy.remove(vectorstore, [f"chunk-{i}" for i in range(VECTOR_COUNT)])
+
+    assert vectorstore.index.ntotal == 0
+    assert vectorstore.index_to_docstore_id == {}
+    assert get_index_type(vectorstore.index) == 'ivf'
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+pytest.importorskip("gunicorn")
+
+from serving_during_ingestion import login, probe_during_ingestion, run_gunicorn
+from synthetic_pdfs import write_pdf
+
+PAGES = 300
+MAX_PROBE_MS = 1000
+
+
+def test_worker_serves_requests_while_ingesting(tmp_path):
+    work_dir = str(tmp_path)
+    pdf_path = write_pdf(os.path.join(work_dir, "ingest.pdf"), PAGES, seed=1)
+    with run_gunicorn(work_dir) as base_url:
+        latencies, _ = probe_during_ingestion(base_url, login(base_url), pdf_path)
+    # A worker blocked by the ingestion answers one late probe once it's done
+    assert len(latencies) > 1
+    assert max(latencies) < MAX_PROBE_MS, latencies
@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+
+
+def estimate_vectorstore_bytes(vectorstore):
+    """Rough resident size of a loaded FAISS vectorstore (vectors + chunk text)."""
+    index = vectorstore.index
+    code_size = getattr(index, 'code_size', 0) or index.d * 4
+    # Memory-mapped inverted lists live in the OS page cache, not the process
+    size = 0 if getattr(vectorstore, 'memory_mapped', False) else index.ntotal * code_size
+
+    # An InMemoryDocstore holds every chunk's text and metadata; a ChunkStore reads them from disk
+    docstore = vectorstore.docstore
+    if hasattr(docstore, 'estimate_bytes'):
+        return size + docstore.estimate_bytes()
+    for doc in getattr(docstore, '_dict', {}).values():
+        size += len(doc.page_content) + 200
+    return size
+
+
+class VectorStoreCache:
+    """Thread-safe LRU cache of loaded vectorstores, bounded by estimated memory.
+
+    Entries are keyed by session id. When the total estimated size goes over
+    ``max_bytes`` the least recently used sessions are evicted. Every
+    invalidation bumps a per-key generation so a load that raced with an
+    upload or delete never puts a stale index back into the cache.
+    """
+
+    def __init__(self, max_bytes, sizeof=estimate_vectorstore_bytes):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_or_load(self, key, loader):
+        store = self.get(key)
+        if store is not None:
+            return store
+
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        store = loader()
+        self._put(key, store, generation)
+        return store
+
+    def put(self, key, store):
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        self._put(key, store, generation)
+
+    def _put(self, key, store, generation):
+        size = self._sizeof(store)
+        with self._lock:
+            if self._generations.get(key, 0) != generation:
+                return
+            self._remove(key)
+            if size > self.max_bytes:
+                # Too big to ever fit; serve it uncached
+                return
+            self._entries[key] = (store, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
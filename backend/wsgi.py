@@ -0,0 +1,36 @@
+"""Production entry point. From the backend directory:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py runs gthread workers, so each process serves many chats at
+once on OS threads, alongside the background jobs that ingest uploads.
+Model clients are created on first use, unless PREWARM_SESSIONS asks for
+them (and recent sessions' indexes) up front.
+"""
+import fcntl
+import os
+
+try:
+    from gevent import monkey
+    if monkey.is_module_patched('socket'):
+        # Only under GUNICORN_WORKER_CLASS=gevent. The Gemini clients use gRPC, whose C
+        # core blocks the event loop unless it is switched to gevent before any channel is created
+        import grpc.experimental.gevent
+        grpc.experimental.gevent.init_gevent()
+except ImportError:
+    pass
+
+from app import app, init_database, remove_interrupted_builds, warm_up
+
+# Every worker runs this on startup; the lock stops them racing to create the same tables
+os.makedirs(app.instance_path, exist_ok=True)
+with open(os.path.join(app.instance_path, 'schema.lock'), 'w') as lock_file:
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    with app.app_context():
+        init_database()
+
+# Document store builds that a crashed worker left half written
+remove_interrupted_builds()
+
+# Load recently used indexes before gunicorn hands this worker any requests
+warm_up()
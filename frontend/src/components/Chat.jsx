@@ -29,6 +29,9 @@ const Chat = ({ sessionId }) => {
   const [warningThreshold, setWarningThreshold] = useState(0);
   const [alertThreshold, setAlertThreshold] = useState(0);
   const [isNewChat, setIsNewChat] = useState(true);
+  // Cursor for the next page of older messages, null once the whole history is loaded
+  const [olderMessagesCursor, setOlderMessagesCursor] = useState(null);
+  const skipAutoScrollRef = useRef(false);
 
   if (!sessionId) {
     return <IntroSection />;
@@ -68,6 +71,22 @@ const Chat = ({ sessionId }) => {
     setDropDirection(lineCount <= 5 ? 'up' : 'down');
   }, [showModeSelector, input]);
 
+  // Poll an ingestion job until the document is indexed (or fails).
+  // Files that were indexed before come back without a job.
+  const waitForJob = async (jobId) => {
+    if (!jobId) {
+      return { status: 'completed' };
+    }
+    while (true) {
+      const response = await api.get(`/jobs/${jobId}`);
+      const job = response.data.job;
+      if (job.status === 'completed' || job.status === 'failed') {
+        return job;
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+  };
+
   const handleFileUpload = async (event) => {
     const files = Array.from(event.target.files);
     if (!files.length) return;
@@ -82,6 +101,45 @@ const Chat = ({ sessionId }) => {
       return;
     }
 
+    // Several files go through the bulk endpoint so they are parsed in parallel
+    if (files.length > 1) {
+      const formData = new FormData();
+      files.forEach(file => formData.append('files', file));
+      formData.append('session_id', sessionId);
+
+      try {
+        const response = await api.post('/upload/bulk', formData, {
+          headers: { 'Content-Type': 'multipart/form-data' },
+        });
+        setDocuments(prev => [...prev, ...response.data.documents]);
+
+        const job = await waitForJob(response.data.job_id);
+        const refreshed = await api.get(`/sessions/${sessionId}/documents`);
+        setDocuments(refreshed.data.documents || []);
+
+        const uploadedIds = response.data.documents.map(doc => doc.id);
+        const failed = (refreshed.data.documents || []).filter(
+          doc => uploadedIds.includes(doc.id) && doc.status === 'failed'
+        );
+
+        setMessages(prev => [...prev, failed.length === 0 ? {
+          isUser: false,
+          text: `${files.length} files have been uploaded and processed successfully.`
+        } : {
+          isUser: false,
+          isError: true,
+          text: job.error || `Error processing ${failed.map(doc => `"${doc.filename}"`).join(', ')}`
+        }]);
+      } catch (error) {
+        setMessages(prev => [...prev, {
+          isUser: false,
+          isError: true,
+          text: error.response?.data?.error || 'Error uploading files'
+        }]);
+      }
+      return;
+    }
+
     for (const file of files) {
       const formData = new FormData();
       formData.append('file', file);
@@ -94,10 +152,20 @@ const Chat = ({ sessionId }) => {
         
         // Update documents list
         setDocuments(prev => [...prev, response.data.document]);
-        
-        setMessages(prev => [...prev, {
+
+        const job = await waitForJob(response.data.job_id);
+        const status = job.status === 'completed' ? 'ready' : 'failed';
+        setDocuments(prev => prev.map(doc =>
+          doc.id === response.data.document.id ? { ...doc, status } : doc
+        ));
+
+        setMessages(prev => [...prev, job.status === 'completed' ? {
           isUser: false,
           text: `File "${file.name}" has been uploaded and processed successfully.`
+        } : {
+          isUser: false,
+          isError: true,
+          text: job.error || 'Error processing file'
         }]);
       } catch (error) {
         setMessages(prev => [...prev, {
@@ -109,6 +177,41 @@ const Chat = ({ sessionId }) => {
     }
   };
 
+  // POST to /chat/stream and call onEvent(event, data) for each Server-Sent Event.
+  // axios can't read a streaming response body in the browser, so this uses fetch.
+  const streamChat = async (body, onEvent) => {
+    const response = await fetch(`${api.defaults.baseURL}/chat/stream`, {
+      method: 'POST',
+      credentials: 'include',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body)
+    });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.error || 'Error sending message');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line; keep any partial event for the next read
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const raw of events) {
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = raw.match(/^data: (.*)$/m)?.[1];
+        if (event && data) {
+          onEvent(event, JSON.parse(data));
+        }
+      }
+    }
+  };
+
   const handleSendMessage = async () => {
     if (!input.trim() || !sessionId) return;
     
@@ -123,34 +226,46 @@ const Chat = ({ sessionId }) => {
     setLoading(true);
 
     try {
-      const response = await api.post('/chat', {
+      let started = false;
+      await streamChat({
         message: input,
         session_id: sessionId,
         mode: selectedMode
-      });
-
-      setMessages(prev => [...prev, {
-        isUser: false,
-        text: response.data.response,
-        mode: selectedMode
-      }]);
-      
-      if (response.data.session.id === sessionId) {
-        const newCount = Math.floor(response.data.chatCount);
-        setChatCount(newCount);
-        setWarningThreshold(response.data.warningThreshold);
-        setAlertThreshold(response.data.alertThreshold);
-        // Only set isNewChat to false after first complete exchange
-        if (newCount > 0) {
-          setIsNewChat(false);
+      }, (event, data) => {
+        if (event === 'token') {
+          // The first token adds the assistant message, later ones extend it
+          const first = !started;
+          started = true;
+          setLoading(false);
+          setMessages(prev => first ? [...prev, {
+            isUser: false,
+            text: data.text,
+            mode: selectedMode
+          }] : [
+            ...prev.slice(0, -1),
+            { ...prev[prev.length - 1], text: prev[prev.length - 1].text + data.text }
+          ]);
+        } else if (event === 'done') {
+          if (data.session.id === sessionId) {
+            const newCount = Math.floor(data.chatCount);
+            setChatCount(newCount);
+            setWarningThreshold(data.warningThreshold);
+            setAlertThreshold(data.alertThreshold);
+            // Only set isNewChat to false after first complete exchange
+            if (newCount > 0) {
+              setIsNewChat(false);
+            }
+          }
+        } else if (event === 'error') {
+          throw new Error(data.error);
         }
-      }
+      });
       
     } catch (error) {
       setMessages(prev => [...prev, {
         isUser: false,
         isError: true,
-        text: error.response?.data?.error || 'Error sending message'
+        text: error.message || 'Error sending message'
       }]);
     } finally {
       setLoading(false);
@@ -170,9 +285,10 @@ const Chat = ({ sessionId }) => {
         const response = await api.get(`/sessions/${sessionId}/messages`);
         const sessionMessages = response.data.messages || [];
         setMessages(sessionMessages);
+        setOlderMessagesCursor(response.data.next_cursor || null);
         
-        // Only count complete exchanges (user message + AI response)
-        const completeExchanges = Math.floor(sessionMessages.length / 2);
+        // Only the newest page is loaded, so take the count from the server
+        const completeExchanges = response.data.chatCount || 0;
         setChatCount(completeExchanges);
         
         // A chat is new if it has no complete exchanges
@@ -185,12 +301,29 @@ const Chat = ({ sessionId }) => {
     fetchSessionMessages();
   }, [sessionId]);
 
+  const loadOlderMessages = async () => {
+    try {
+      const response = await api.get(`/sessions/${sessionId}/messages`, {
+        params: { cursor: olderMessagesCursor }
+      });
+      skipAutoScrollRef.current = true;
+      setMessages(prev => [...(response.data.messages || []), ...prev]);
+      setOlderMessagesCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching older messages:', error);
+    }
+  };
+
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
-  // Auto-scroll on new messages
+  // Auto-scroll on new messages, but not when older history is prepended
   useEffect(() => {
+    if (skipAutoScrollRef.current) {
+      skipAutoScrollRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -241,6 +374,16 @@ const Chat = ({ sessionId }) => {
         ref={messagesContainerRef}
         className="flex-1 overflow-y-auto p-4 space-y-4 relative"
       >
+        {olderMessagesCursor && (
+          <div className="flex justify-center">
+            <button
+              onClick={loadOlderMessages}
+              className="text-sm text-gray-500 dark:text-gray-400 hover:underline"
+            >
+              Load earlier messages
+            </button>
+          </div>
+        )}
         {messages.map((message, index) => (
           <div
             key={index}
@@ -123,18 +123,21 @@ const ChatItem = ({ session, isActive, onSelect, onRename, onDelete }) => {
 
 const Sidebar = ({ onSessionSelect, currentSessionId, isDarkMode, onThemeToggle }) => {
   const [sessions, setSessions] = useState([]);
+  // Cursor for the next page of older sessions, null once all are loaded
+  const [nextCursor, setNextCursor] = useState(null);
   const { logout, user } = useAuth();
 
-  useEffect(() => {
-    const fetchSessions = async () => {
-      try {
-        const response = await api.get('/sessions');
-        setSessions(response.data.sessions);
-      } catch (error) {
-        console.error('Error fetching sessions:', error);
-      }
-    };
+  const fetchSessions = async (cursor = null) => {
+    try {
+      const response = await api.get('/sessions', { params: cursor ? { cursor } : {} });
+      setSessions(prev => cursor ? [...prev, ...response.data.sessions] : response.data.sessions);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching sessions:', error);
+    }
+  };
 
+  useEffect(() => {
     fetchSessions();
   }, []);
 
@@ -248,6 +251,14 @@ const Sidebar = ({ onSessionSelect, currentSessionId, isDarkMode, onThemeToggle
             onDelete={handleDelete}
           />
         ))}
+        {nextCursor && (
+          <button
+            onClick={() => fetchSessions(nextCursor)}
+            className="w-full mt-2 p-2 text-sm text-gray-400 hover:text-white transition-colors"
+          >
+            Load more
+          </button>
+        )}
       </div>
       
       {/* Settings Section */}